@@ -32,7 +32,7 @@ def main():
     num_genes = 40
     gene_length = 18  # lower + upper bound for each 9 data points
 
-    classifier = BcwClassifier(data, num_genes, gene_length)
+    classifier = BcwClassifier(data, num_genes, gene_length, vectorized=True)
 
     #---------------------------------------------------------------------------
     # Generate the initial population
@@ -119,7 +119,7 @@ def main():
 
     for gene in p.max_individual().genes:
         for pair in classifier.batch_gen(gene.alleles, 2):
-            print pair
+            print list(pair)
 
         print gene.class_label
         print
@@ -0,0 +1,170 @@
+#-------------------------------------------------------------------------------
+# Author: Justin Lewis Salmon <mccrustin@gmail.com>
+#-------------------------------------------------------------------------------
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#-------------------------------------------------------------------------------
+
+import argparse
+import gc
+import multiprocessing
+import resource
+import time
+from sga import crossover, fitness, genome, mutation, selection
+from sga.genome import Genome
+from sga.population import Population
+from sga.representation import Representation
+
+
+def int_population(size, copy_on_write):
+    """
+    Integer problem using list-based genomes and operators which are all
+    copy-on-write safe
+    """
+    p = Population(representation=Representation({'type': 'int',
+                                                  'length': 1000,
+                                                  'min': 0, 'max': 9}),
+                   size=size,
+                   fitness_func=fitness.all_small,
+                   selection_func=selection.tournament,
+                   crossover_func=crossover.uniform,
+                   mutation_func=mutation.swap,
+                   natural_fitness=True,
+                   crossover_probability=0.6,
+                   mutation_probability=0.1,
+                   elite_count=6,
+                   tournament_size=10,
+                   copy_on_write=copy_on_write)
+    p.gen_population()
+    return p
+
+
+def real_value_population(size, copy_on_write):
+    """
+    Real-valued rule classifier on data3.txt, whose Gene-based genomes are
+    mutated in place
+    """
+    from classifier.RealValueClassifier import RealValueClassifier
+
+    with open('classifier/data/data3.txt', 'r') as f:
+        f.readline()
+        data = [map(float, line.rstrip().split()) for line in f]
+
+    classifier = RealValueClassifier(data, 12, 12 * len(data),
+                                     vectorized=True)
+
+    p = Population(representation=classifier.representation,
+                   size=size,
+                   fitness_func=classifier.fitness_func,
+                   selection_func=classifier.selection_func,
+                   crossover_func=classifier.crossover_func,
+                   mutation_func=classifier.mutation_func,
+                   natural_fitness=True,
+                   crossover_probability=classifier.crossover_prob,
+                   mutation_probability=classifier.mutation_prob,
+                   elite_count=classifier.elite_count,
+                   tournament_size=classifier.tournament_size,
+                   copy_on_write=copy_on_write)
+
+    for _ in xrange(p.size):
+        individual = Genome([classifier.make_new_gene() for _ in xrange(40)],
+                            p.representation, p.fitness_func, True)
+        individual.average_sigmas = list()
+        individual.strategy_params = {'mutation_step_size': 0.05}
+        p.population.append(individual)
+
+    return p
+
+
+PROBLEMS = {'int': int_population,
+            'real': real_value_population}
+
+
+def run(problem, size, generations, copy_on_write, results):
+    """
+    Run the given problem for the given number of generations and put the
+    timing, copy and memory statistics on the results queue
+    """
+    p = PROBLEMS[problem](size, copy_on_write)
+    p.calculate_fitnesses()
+
+    gc.collect()
+    copies = genome.copies
+    start = time.time()
+
+    for _ in xrange(generations):
+        p.store_elites()
+        p.select_parents()
+        p.crossover(p.crossover_probability)
+        p.mutate(p.mutation_probability)
+        p.load_elites()
+        p.calculate_fitnesses()
+
+    results.put((time.time() - start,
+                 genome.copies - copies,
+                 resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+
+
+def main():
+    """
+    Compare copy-on-write genomes with copying every individual eagerly, on
+    each of the benchmark problems
+    """
+    parser = argparse.ArgumentParser(description='Benchmark genome copying.')
+    parser.add_argument('problems',
+                        nargs='*',
+                        metavar='problem',
+                        help='problems to run [%s] (default: all)'
+                             % ', '.join(sorted(PROBLEMS)),
+                        default=sorted(PROBLEMS))
+    parser.add_argument('-p', '--population-size',
+                        dest='population_size',
+                        type=int,
+                        metavar='population_size',
+                        help='population size (default: 100)',
+                        default=100)
+    parser.add_argument('-g', '--generations',
+                        dest='generations',
+                        type=int,
+                        metavar='generations',
+                        help='number of generations to simulate '
+                             '(default: 50)',
+                        default=50)
+    args = parser.parse_args()
+
+    print '%-8s %-14s %10s %14s %14s' \
+          % ('problem', 'copying', 'time (s)', 'gene copies', 'peak RSS (KB)')
+
+    for problem in args.problems:
+        for copy_on_write in (False, True):
+            #-------------------------------------------------------------------
+            # Run each benchmark in a fresh process, so that the peak memory
+            # usage of one doesn't hide that of the next
+            #-------------------------------------------------------------------
+            results = multiprocessing.Queue()
+            worker = multiprocessing.Process(target=run,
+                                             args=(problem,
+                                                   args.population_size,
+                                                   args.generations,
+                                                   copy_on_write, results))
+            worker.start()
+            elapsed, copies, max_rss = results.get()
+            worker.join()
+
+            print '%-8s %-14s %10.2f %14d %14d' \
+                  % (problem, 'copy-on-write' if copy_on_write else 'eager',
+                     elapsed, copies, max_rss)
+
+
+if __name__ == '__main__':
+    main()
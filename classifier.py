@@ -6,6 +6,7 @@ from classifier.RealValueClassifier import RealValueClassifier, chunker
 from classifier.VariableLengthBinaryClassifier import \
     VariableLengthBinaryClassifier
 from classifier.gene import Gene
+from sga.checkpoint import Checkpoint
 from sga.population import Population
 from sga.selection import tournament
 
@@ -14,11 +15,23 @@ def main():
     """
     Run the classification GA on the data file given on the the command line
     """
-    if len(sys.argv) != 2:
-        sys.exit('usage: classifier.py datafile')
+    if len(sys.argv) not in (2, 3):
+        sys.exit('usage: classifier.py datafile [checkpoint]')
 
     data_file = sys.argv[1]
 
+    #---------------------------------------------------------------------------
+    # Save the population every 10 generations, and carry on from the last
+    # checkpoint if there is one. The data is shuffled before it is split into
+    # training and validation sets, so seed the shuffle to split it the same
+    # way every time.
+    #---------------------------------------------------------------------------
+    checkpoint = None
+
+    if len(sys.argv) == 3:
+        checkpoint = Checkpoint(sys.argv[2], resume=True, gene_class=Gene)
+        random.seed(data_file)
+
     with open(data_file, 'r') as f:
         # Read the first (informational) line
         info_line = f.readline().split()
@@ -47,7 +60,7 @@ def main():
             gene_length = (gene_length * 2) - 2
             genome_length = (int(info_line[0]) * gene_length)
             classifier = RealValueClassifier(data, gene_length,
-                                             genome_length)
+                                             genome_length, vectorized=True)
 
         else:
             raise IOError('unknown data file format')
@@ -121,7 +134,7 @@ def main():
     #---------------------------------------------------------------------------
     # Run the GA
     #---------------------------------------------------------------------------
-    p.run(generations)
+    p.run(generations, checkpoint=checkpoint)
 
     #---------------------------------------------------------------------------
     # Validate the population
@@ -170,7 +183,7 @@ def main():
 
         for gene in p.max_individual().genes:
             for pair in chunker(gene.alleles, 2):
-                print pair
+                print list(pair)
 
             print gene.class_label
             print
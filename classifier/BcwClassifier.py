@@ -6,9 +6,10 @@ from sga.selection import tournament
 
 class BcwClassifier(RealValueClassifier):
 
-    def __init__(self, data, num_genes, gene_length):
+    def __init__(self, data, num_genes, gene_length, vectorized=False):
         """"""
-        super(BcwClassifier, self).__init__(data, gene_length, num_genes)
+        super(BcwClassifier, self).__init__(data, gene_length, num_genes,
+                                            vectorized)
 
         self.representation = Representation({"length": 50 * gene_length,
                                               "type": "int",
@@ -35,7 +36,8 @@ class BcwClassifier(RealValueClassifier):
 
         # self.mutation_func = self.mutation_func_one_sigma
 
-        self.mutation_func = self.mutation_func_n_sigma
+        self.mutation_func = self.mutation_func_n_sigma_vectorized \
+            if vectorized else self.mutation_func_n_sigma
         self.common_sd = 0.5
         self.bound_sd = 1
         self.spread_sd = 1
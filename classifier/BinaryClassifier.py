@@ -1,8 +1,25 @@
+import numpy
 import random
+from collections import OrderedDict
+from sga.genome import cow_safe
 from sga.representation import Representation
 from sga.selection import tournament
 
 
+def weighted_rows(data):
+    """
+    Return the distinct rows of the given data set, in the order they first
+    appear, and the number of times each of them appears. Identical rows are
+    always classified the same way, so they only need to be scored once.
+    """
+    counts = OrderedDict()
+    for item in data:
+        key = tuple(item)
+        counts[key] = counts.get(key, 0) + 1
+
+    return [list(key) for key in counts], counts.values()
+
+
 class BinaryClassifier(object):
     """
     Binary classification with wildcard generalization
@@ -18,6 +35,10 @@ class BinaryClassifier(object):
         # Split the data into training/validation sets
         self.split_data(data)
 
+        # Encode the distinct rows of each set as integers for fast matching
+        self.training_rows = self.encode_rows(self.training_set)
+        self.validation_rows = self.encode_rows(self.validation_set)
+
         self.representation = Representation({"length": genome_length,
                                               "type": "enum",
                                               "values": ['0', '1'],
@@ -37,22 +58,101 @@ class BinaryClassifier(object):
         self.validation_set = data[(len(data) / 1):]
 
     def fitness_func(self, genome, validate=False):
-        """"""
-        fitness = 0
-        data_set = self.validation_set if validate else self.training_set
+        """
+        Return the number of rows of the data set which are correctly
+        classified by the first rule (gene) of the genome that matches them.
+        Each rule is compiled to a pair of integer masks (see compile_rules),
+        so all of the rows are matched against all of the rules at once.
+        """
+        features, labels, counts = self.validation_rows if validate \
+            else self.training_rows
+        cares, values, classes = self.compile_rules(genome)
 
-        for item in data_set:
-            for gene in self.batch_gen(genome, self.gene_length):
-                # Don't allow the stupid catch-all gene (ugly hack)
-                if gene[0] == '#' and len(set(gene)) == 2:
-                    break
+        if not len(features) or not len(cares):
+            return 0
 
-                if self.matches(gene[:-1], item[:-1]):
-                    if gene[-1] == item[-1]:
-                        fitness += 1
-                    break
+        matched = (features[:, numpy.newaxis] & cares) == values
+        first = matched.argmax(axis=1)
 
-        return fitness
+        correct = matched[numpy.arange(len(features)), first] \
+            & (classes[first] == labels)
+
+        return int(correct.dot(counts))
+
+    def encode_rows(self, data):
+        """
+        Return the features of each distinct row of the given data set as an
+        integer (the first feature being the most significant bit), the class
+        of each distinct row, and the number of times each one appears, as
+        three arrays
+        """
+        data, counts = weighted_rows(data)
+        dtype = numpy.int64 if self.gene_length <= 63 else object
+
+        features = numpy.array([int(''.join(item[:-1]), 2) for item in data],
+                               dtype=dtype)
+        labels = numpy.array([int(item[-1]) for item in data],
+                             dtype=numpy.int64)
+
+        return features, labels, numpy.array(counts, dtype=numpy.int64)
+
+    def compile_rules(self, genome):
+        """
+        Return the care masks, value masks and classes of the rules (genes) of
+        the given genome. A row matches a rule if (row & care) == value, so
+        each '#' in the rule is a 0 in its care mask.
+
+        The catch-all rule (a '#' followed by only one other kind of
+        character) matches every row without classifying it correctly, so
+        that it can't be used to cheat. A rule whose class is not 0 or 1
+        never classifies a row correctly.
+        """
+        length = self.gene_length
+        whole = len(genome) - len(genome) % length
+        dtype = numpy.int64 if length <= 63 else object
+
+        genes = numpy.frombuffer(''.join(genome[:whole]), dtype=numpy.uint8) \
+            .reshape(-1, length)
+        conditions = genes[:, :-1]
+
+        weights = numpy.array([1 << i for i in xrange(length - 2, -1, -1)],
+                              dtype=dtype)
+        cares = (conditions != ord('#')).astype(dtype).dot(weights)
+        values = (conditions == ord('1')).astype(dtype).dot(weights)
+        classes = genes[:, -1].astype(numpy.int64) - ord('0')
+        classes[(classes != 0) & (classes != 1)] = -1
+
+        kinds = sum((genes == ord(c)).any(axis=1).astype(int) for c in '#01')
+        catch_all = (genes[:, 0] == ord('#')) & (kinds == 2)
+        cares[catch_all] = 0
+        values[catch_all] = 0
+        classes[catch_all] = -1
+
+        #-----------------------------------------------------------------------
+        # A final, shorter gene only constrains the features that it covers
+        #-----------------------------------------------------------------------
+        if whole < len(genome):
+            gene = genome[whole:]
+            care = value = 0
+
+            for i, allele in enumerate(gene[:-1]):
+                bit = 1 << (length - 2 - i)
+                if allele != '#':
+                    care |= bit
+                if allele == '1':
+                    value |= bit
+
+            label = int(gene[-1]) if gene[-1] in ('0', '1') else -1
+
+            if gene[0] == '#' and len(set(gene)) == 2:
+                care = value = 0
+                label = -1
+
+            cares = numpy.append(cares, numpy.array([care], dtype=dtype))
+            values = numpy.append(values, numpy.array([value], dtype=dtype))
+            classes = numpy.append(classes, label)
+
+        return cares, values, classes
 
     def matches(self, gene, data):
         """"""
@@ -64,6 +164,7 @@ class BinaryClassifier(object):
 
         return True
 
+    @cow_safe
     def crossover_func(self, male, female):
         """"""
         ratio = 0.5
@@ -1,6 +1,9 @@
 import random
 import math
-from classifier.BinaryClassifier import BinaryClassifier
+import numpy
+import array
+from cpython cimport array
+from classifier.BinaryClassifier import BinaryClassifier, weighted_rows
 from classifier.gene import Gene
 from sga.representation import Representation
 from sga.selection import tournament, roulette
@@ -27,11 +30,21 @@ cdef class RealValueClassifier(object):
     cdef public double tau
     cdef public double tau_
     cdef public double common
+    cdef public double common_sd
+    cdef public double bound_sd
+    cdef public double spread_sd
+    cdef public bint vectorized
+    cdef dict data_arrays_cache
 
-    def __init__(self, data, gene_length, genome_length):
-        """"""
+    def __init__(self, data, gene_length, genome_length, vectorized=False):
+        """
+        :param vectorized: calculate fitness with NumPy array operations over
+                           the whole data set, rather than row by row
+        """
         self.gene_length = gene_length
         self.genome_length = genome_length
+        self.vectorized = vectorized
+        self.data_arrays_cache = dict()
 
         # Shuffle the data
         random.shuffle(data)
@@ -51,7 +64,8 @@ cdef class RealValueClassifier(object):
 
         # self.mutation_func = self.mutation_func_one_sigma
 
-        self.mutation_func = self.mutation_func_n_sigma
+        self.mutation_func = self.mutation_func_n_sigma_vectorized \
+            if vectorized else self.mutation_func_n_sigma
         self.common_sd = 0.5
         self.bound_sd = 1
         self.spread_sd = 1
@@ -85,7 +99,45 @@ cdef class RealValueClassifier(object):
         cdef list data_set
         data_set = self.validation_set if validate else self.training_set
 
-        return fitness_func(genome, data_set)
+        if self.vectorized:
+            features, labels, counts = self.data_arrays(data_set)
+            return vectorized_fitness_func(genome, features, labels, counts)
+
+        rows, counts = self.weighted_rows(data_set)[:2]
+        return fitness_func(genome, rows, counts)
+
+    def weighted_rows(self, data_set):
+        """
+        Return the distinct rows of the given data set, the number of times
+        each one appears, and their arrays (see data_arrays), or None if they
+        haven't been built yet. These are only worked out the first time each
+        data set is seen.
+        """
+        cached = self.data_arrays_cache.get(id(data_set))
+
+        if cached is None or cached[0] is not data_set:
+            rows, counts = weighted_rows(data_set)
+            cached = [data_set, rows, counts, None]
+            self.data_arrays_cache[id(data_set)] = cached
+
+        return cached[1:]
+
+    def data_arrays(self, data_set):
+        """
+        Return the distinct rows of the given data set as an (n_rows,
+        n_features) array of features, an array of class labels and an array
+        of the number of times each row appears. The arrays are only built the
+        first time each data set is seen.
+        """
+        rows, counts, arrays = self.weighted_rows(data_set)
+
+        if arrays is None:
+            data = numpy.array(rows, dtype=numpy.float64)
+            arrays = (data[:, :-1], data[:, -1],
+                      numpy.array(counts, dtype=numpy.int64))
+            self.data_arrays_cache[id(data_set)][3] = arrays
+
+        return arrays
 
     def crossover_func(self, male, female):
         """"""
@@ -290,6 +342,63 @@ cdef class RealValueClassifier(object):
         #genes = self.mutate_length(genes)
         return genes
 
+    def mutation_func_n_sigma_vectorized(self, individual, probability):
+        """
+        Equivalent to mutation_func_n_sigma(), but mutates every allele of
+        every gene at once. The same distributions are used for the sigma
+        updates and bound perturbations, so the statistics of the result are
+        the same, although the random numbers themselves are drawn from NumPy.
+        """
+        genes = individual.genes
+
+        if not len(genes):
+            return genes
+
+        #-----------------------------------------------------------------------
+        # (n_genes, gene_length) arrays of the alleles and their step sizes
+        #-----------------------------------------------------------------------
+        alleles = numpy.frombuffer(b''.join([gene.alleles.tostring()
+                                             for gene in genes]),
+                                   dtype=numpy.float64).reshape(len(genes), -1)
+        sigmas = numpy.frombuffer(b''.join([gene.mutation_step_sizes.tostring()
+                                            for gene in genes]),
+                                  dtype=numpy.float64).reshape(len(genes), -1)
+
+        n = self.representation.length
+        tau = 1 / math.sqrt(2 * math.sqrt(n))
+        tau_ = 1 / math.sqrt(2 * n)
+
+        common = numpy.random.normal(0, self.common_sd)
+        spread = numpy.random.normal(0, self.spread_sd, sigmas.shape)
+
+        # Mutate sigma values, with the boundary rule
+        epsilon = 0.001
+        sigmas = numpy.maximum(sigmas * numpy.exp(tau_ * common + tau * spread),
+                               epsilon)
+
+        # Mutate each bound with probability equal to its sigma
+        mutate = numpy.random.random(alleles.shape) < sigmas
+        alleles = alleles + mutate * numpy.random.normal(0, self.bound_sd,
+                                                         alleles.shape)
+        alleles = numpy.clip(alleles, 0.0, 1.0)
+
+        # Make sure lower < upper
+        lower = numpy.minimum(alleles[:, 0::2], alleles[:, 1::2])
+        upper = numpy.maximum(alleles[:, 0::2], alleles[:, 1::2])
+        alleles[:, 0::2] = lower
+        alleles[:, 1::2] = upper
+
+        for i, gene in enumerate(genes):
+            gene.alleles = array.array('d', alleles[i].tostring())
+            gene.mutation_step_sizes = array.array('d', sigmas[i].tostring())
+
+        # Update info for plotter
+        self.genome_lengths.append(len(individual))
+
+        individual.average_sigmas.append(sigmas.mean(axis=1).mean())
+
+        return genes
+
     def mutate_length(self, genes):
         """"""
         length_change_prob = 0.01
@@ -322,17 +431,21 @@ cdef class RealValueClassifier(object):
                                     in xrange(self.gene_length)]
         return gene
 
-cdef int fitness_func(genome, data_set) except *:
-    """"""
+cdef int fitness_func(genome, list data_set, list counts) except *:
+    """
+    :param   genome: the list of genes (rules) to evaluate
+    :param data_set: the distinct rows of the data set
+    :param   counts: the number of times each row appears in the data set
+    """
     fitness = 0
 
     # Is each gene within a specific bound? Creating boxes in the input
     # space
 
     cdef list item
-    cdef list alleles
+    cdef int count
 
-    for item in data_set:
+    for item, count in zip(data_set, counts):
         for gene in genome:
             alleles = gene.alleles
 
@@ -350,24 +463,68 @@ cdef int fitness_func(genome, data_set) except *:
 
             match = matches(alleles, item[:-1])
             if match == -1:
-                fitness -= 1
+                fitness -= count
 
             if match == 1:
                 if gene.class_label == item[-1]:
-                    fitness += 1
+                    fitness += count
                 break
 
     return fitness
 
-cdef int matches(gene, data) except *:
+def vectorized_fitness_func(genome, features, labels, counts=None):
+    """
+    Equivalent to fitness_func(), but matches every rule against every row of
+    the data set at once.
+
+    :param   genome: the list of genes (rules) to evaluate
+    :param features: (n_rows, n_features) array of input values
+    :param   labels: array of the class label of each row
+    :param   counts: optional array of the number of times each row appears
+                     in the data set
+    :returns:        the number of rows whose first matching rule predicts the
+                     correct class
+    """
+    if not len(genome) or not len(features):
+        return 0
+
+    #---------------------------------------------------------------------------
+    # (n_genes, n_features, 2) array of (lower, upper) bounds, with each pair
+    # put the right way round. The alleles of each gene are already stored as
+    # doubles, so their raw bytes can be joined together.
+    #---------------------------------------------------------------------------
+    bounds = numpy.frombuffer(b''.join([gene.alleles.tostring()
+                                        for gene in genome]),
+                              dtype=numpy.float64).reshape(len(genome), -1, 2)
+    lower = bounds.min(axis=2)
+    upper = bounds.max(axis=2)
+    features = features[:, :bounds.shape[1]]
+
+    #---------------------------------------------------------------------------
+    # (n_rows, n_genes) array of whether each row is inside each rule's box
+    #---------------------------------------------------------------------------
+    inside = ((lower[numpy.newaxis] < features[:, numpy.newaxis])
+              & (features[:, numpy.newaxis] < upper[numpy.newaxis])).all(axis=2)
+
+    #---------------------------------------------------------------------------
+    # Only the first matching rule counts for each row
+    #---------------------------------------------------------------------------
+    matched = inside.any(axis=1)
+    first_match = inside.argmax(axis=1)
+
+    class_labels = numpy.array([gene.class_label for gene in genome])
+    correct = matched & (class_labels[first_match] == labels)
+
+    return int(correct.sum() if counts is None else correct.dot(counts))
+
+cdef int matches(array.array gene, data) except *:
     cdef int i, num_generic = 0
-    cdef list pair
     cdef double lower, upper
 
-    for i, pair in enumerate(chunker(gene, 2)):
+    for i in range(len(gene) // 2):
 
-        lower = pair[0]
-        upper = pair[1]
+        lower = gene.data.as_doubles[2 * i]
+        upper = gene.data.as_doubles[2 * i + 1]
 
         if lower > upper:
             lower, upper = upper, lower
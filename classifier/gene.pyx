@@ -1,16 +1,72 @@
+from cpython cimport array
+import array
+
+
+cdef array.array as_doubles(values):
+    """
+    Return the given values as an array of doubles, without copying them if
+    they already are one
+    """
+    if isinstance(values, array.array) and values.typecode == 'd':
+        return values
+    return array.array('d', values)
+
+
 cdef class Gene(object):
-    cdef public list alleles
-    cdef public class_label
-    cdef public list mutation_step_sizes
+    """
+    A single interval rule. The alleles (lower/upper bound pairs) and their
+    mutation step sizes are stored in contiguous arrays of doubles rather than
+    lists of float objects, and the class label is a plain int. Lists assigned
+    to alleles or mutation_step_sizes are converted.
+    """
+    cdef array.array _alleles
+    cdef array.array _mutation_step_sizes
+    cdef public int class_label
 
     def __init__(self, alleles):
         self.alleles = alleles
 
+    property alleles:
+        def __get__(self):
+            return self._alleles
+
+        def __set__(self, alleles):
+            self._alleles = as_doubles(alleles)
+
+    property mutation_step_sizes:
+        def __get__(self):
+            return self._mutation_step_sizes
+
+        def __set__(self, mutation_step_sizes):
+            self._mutation_step_sizes = None if mutation_step_sizes is None \
+                else as_doubles(mutation_step_sizes)
+
     def __repr__(self):
-        return repr(self.alleles)
+        return repr(self._alleles.tolist())
 
     def __len__(self):
         return len(self.alleles)
 
     def __iter__(self):
         return iter(self.alleles)
+
+    def __richcmp__(self, other, int op):
+        """
+        Two genes are equal if they describe the same rule, i.e. they have the
+        same alleles and class label. Mutation step sizes are not compared,
+        since they have no effect on fitness.
+        """
+        if op not in (2, 3) or not isinstance(self, Gene) \
+                or not isinstance(other, Gene):
+            return NotImplemented
+
+        equal = self.alleles == other.alleles \
+            and self.class_label == other.class_label
+        return equal if op == 2 else not equal
+
+    def __reduce__(self):
+        return Gene, (self.alleles,), (self.class_label,
+                                       self.mutation_step_sizes)
+
+    def __setstate__(self, state):
+        self.class_label, self.mutation_step_sizes = state
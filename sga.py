@@ -18,8 +18,17 @@
 import argparse
 import json
 from sga import selection, crossover, mutation, fitness
+from sga.arraypopulation import ArrayPopulation
+from sga.asynchronous import AsynchronousPopulation
+from sga.cache import FitnessCache
+from sga.checkpoint import Checkpoint
+from sga.evaluator import EVALUATORS
+from sga.island import IslandModel, TOPOLOGIES
 from sga.population import Population
 from sga.representation import Representation
+from sga.steadystate import SteadyStatePopulation, REPLACEMENTS
+from sga.termination import Any, TargetFitness, Stagnation, DiversityFloor, \
+    TimeLimit, MaxEvaluations
 
 
 def setup_args():
@@ -59,28 +68,33 @@ def setup_args():
                         dest='selection_scheme',
                         action='store',
                         metavar="selection_scheme",
-                        help='selection scheme to use [roulette, tournament]'
+                        help='selection scheme to use [roulette, tournament,'
+                             ' vectorized_roulette, vectorized_tournament,'
+                             ' stochastic_universal, rank]'
                              ' (default: roulette)',
                         default='roulette')
     parser.add_argument('-C', '--crossover-scheme',
                         dest='crossover_scheme',
                         action='store',
                         metavar="crossover_scheme",
-                        help='crossover scheme to use [single_point, uniform]'
+                        help='crossover scheme to use [single_point, uniform,'
+                             ' order, partially_mapped, edge_recombination,'
+                             ' batch_single_point, batch_uniform]'
                              ' (default: single_point)',
                         default='single_point')
     parser.add_argument('-M', '--mutation-scheme',
                         dest='mutation_scheme',
                         action='store',
                         metavar="mutation_scheme",
-                        help='mutation scheme to use [bit_flip, swap]'
-                             ' (default: bit_flip)',
+                        help='mutation scheme to use [bit_flip, swap,'
+                             ' batch_bit_flip, batch_swap] (default: bit_flip)',
                         default='bit_flip')
     parser.add_argument('-f', '--fitness-function',
                         dest='fitness_function',
                         action='store',
                         metavar="fitness_function",
-                        help='fitness function to use [all_ones, matching_bits]'
+                        help='fitness function to use [all_ones, matching_bits,'
+                             ' batch_all_ones, batch_matching_bits]'
                              ' (default: all_ones)',
                         default='all_ones')
     parser.add_argument('-n', '--natural-fitness',
@@ -125,6 +139,149 @@ def setup_args():
                         metavar='tournament_size',
                         help='size of a tournament group, if tournament '
                              'selection is being used (default: 10)')
+    parser.add_argument('-E', '--evaluator',
+                        dest='evaluator',
+                        action='store',
+                        choices=sorted(EVALUATORS),
+                        metavar='evaluator',
+                        help='fitness evaluation backend to use '
+                             '[serial, thread, process] (default: serial)',
+                        default='serial')
+    parser.add_argument('-w', '--workers',
+                        dest='workers',
+                        action='store',
+                        type=int,
+                        metavar='workers',
+                        help='number of worker threads/processes used by a '
+                             'parallel evaluator (default: number of CPUs)')
+    parser.add_argument('--cache-size',
+                        dest='cache_size',
+                        action='store',
+                        type=int,
+                        metavar='cache_size',
+                        help='maximum number of genotypes to remember in the '
+                             'fitness cache, 0 to disable (default: 0)',
+                        default=0)
+    parser.add_argument('--array',
+                        dest='array',
+                        action='store_true',
+                        help='store the whole population in a single NumPy '
+                             'array (fixed-length representations only)')
+    parser.add_argument('--steady-state',
+                        dest='steady_state',
+                        action='store_true',
+                        help='breed and evaluate a few offspring at a time, '
+                             'replacing the least fit individuals, rather than '
+                             'a whole generation at once')
+    parser.add_argument('--asynchronous',
+                        dest='asynchronous',
+                        action='store_true',
+                        help='like --steady-state, but keep the evaluator\'s '
+                             'workers busy by breeding a new child as soon as '
+                             'each evaluation finishes')
+    parser.add_argument('--offspring',
+                        dest='offspring',
+                        action='store',
+                        type=int,
+                        metavar='offspring',
+                        help='number of offspring to breed at a time, if '
+                             '--steady-state or --asynchronous is used '
+                             '(default: 2)',
+                        default=2)
+    parser.add_argument('--replacement',
+                        dest='replacement',
+                        action='store',
+                        choices=REPLACEMENTS,
+                        metavar='replacement',
+                        help='which individuals the offspring replace, if '
+                             '--steady-state or --asynchronous is used '
+                             '[worst, tournament] (default: worst)',
+                        default='worst')
+    parser.add_argument('-I', '--islands',
+                        dest='islands',
+                        action='store',
+                        type=int,
+                        metavar='islands',
+                        help='number of populations to evolve in parallel, '
+                             'one per process, exchanging their fittest '
+                             'individuals (default: 1)',
+                        default=1)
+    parser.add_argument('--migration-interval',
+                        dest='migration_interval',
+                        action='store',
+                        type=int,
+                        metavar='migration_interval',
+                        help='number of generations between migrations, '
+                             'if there is more than one island (default: 10)',
+                        default=10)
+    parser.add_argument('--migration-size',
+                        dest='migration_size',
+                        action='store',
+                        type=int,
+                        metavar='migration_size',
+                        help='number of individuals each island sends at '
+                             'each migration (default: 2)',
+                        default=2)
+    parser.add_argument('--topology',
+                        dest='topology',
+                        action='store',
+                        choices=TOPOLOGIES,
+                        metavar='topology',
+                        help='where each island sends its migrants '
+                             '[ring, random] (default: ring)',
+                        default='ring')
+    parser.add_argument('--target-fitness',
+                        dest='target_fitness',
+                        action='store',
+                        type=float,
+                        metavar='target_fitness',
+                        help='stop once the fittest individual reaches this '
+                             'raw fitness value')
+    parser.add_argument('--stagnation',
+                        dest='stagnation',
+                        action='store',
+                        type=int,
+                        metavar='stagnation',
+                        help='stop once the fittest individual has not '
+                             'improved for this many generations')
+    parser.add_argument('--min-diversity',
+                        dest='min_diversity',
+                        action='store',
+                        type=float,
+                        metavar='min_diversity',
+                        help='stop once the proportion of distinct genotypes '
+                             'in the population falls below this value')
+    parser.add_argument('--time-limit',
+                        dest='time_limit',
+                        action='store',
+                        type=float,
+                        metavar='time_limit',
+                        help='stop after this many seconds')
+    parser.add_argument('--max-evaluations',
+                        dest='max_evaluations',
+                        action='store',
+                        type=int,
+                        metavar='max_evaluations',
+                        help='stop after this many fitness evaluations')
+    parser.add_argument('--checkpoint',
+                        dest='checkpoint',
+                        action='store',
+                        metavar='checkpoint',
+                        help='file to save the state of the population to '
+                             'periodically, so that the run can be resumed')
+    parser.add_argument('--checkpoint-interval',
+                        dest='checkpoint_interval',
+                        action='store',
+                        type=int,
+                        metavar='checkpoint_interval',
+                        help='number of generations between checkpoints '
+                             '(default: 10)',
+                        default=10)
+    parser.add_argument('--resume',
+                        dest='resume',
+                        action='store_true',
+                        help='carry on from the --checkpoint file, if it '
+                             'exists, up to the same number of generations')
 
     parser.set_defaults(natural_fitness=True)
 
@@ -133,6 +290,16 @@ def setup_args():
     #---------------------------------------------------------------------------
     args = parser.parse_args()
 
+    if (args.steady_state or args.asynchronous) and args.array:
+        parser.error('--steady-state and --asynchronous cannot be used with '
+                     '--array')
+
+    if args.resume and not args.checkpoint:
+        parser.error('--resume needs a --checkpoint file')
+
+    if args.checkpoint and args.islands > 1:
+        parser.error('--checkpoint cannot be used with more than one island')
+
     #-----------------------------------------------------------------------
     # Get the function pointers
     #-----------------------------------------------------------------------
@@ -141,9 +308,28 @@ def setup_args():
         args.crossover_scheme = getattr(crossover, args.crossover_scheme)
         args.mutation_scheme  = getattr(mutation,  args.mutation_scheme)
         args.fitness_function = getattr(fitness,   args.fitness_function)
+        args.evaluator        = EVALUATORS[args.evaluator](args.workers)
     except AttributeError, e:
         raise e
 
+    #-----------------------------------------------------------------------
+    # Stop early if any of the given termination criteria are met
+    #-----------------------------------------------------------------------
+    criteria = list()
+
+    if args.target_fitness is not None:
+        criteria.append(TargetFitness(args.target_fitness))
+    if args.stagnation is not None:
+        criteria.append(Stagnation(args.stagnation))
+    if args.min_diversity is not None:
+        criteria.append(DiversityFloor(args.min_diversity))
+    if args.time_limit is not None:
+        criteria.append(TimeLimit(args.time_limit))
+    if args.max_evaluations is not None:
+        criteria.append(MaxEvaluations(args.max_evaluations))
+
+    args.termination = Any(*criteria) if criteria else None
+
     return args
 
 
@@ -174,28 +360,56 @@ def main():
           % (args.selection_scheme, args.crossover_scheme, args.mutation_scheme,
              args.fitness_function, args.natural_fitness)
 
-    args.representation = {"type":"enum","length":50,"values":[1,2,3,4,5]}
-    args.mutation_scheme = mutation.swap
     #---------------------------------------------------------------------------
     # Generate the initial population
     #---------------------------------------------------------------------------
-    p = Population(representation=Representation(args.representation),
-                   size=args.population_size,
-                   fitness_func=args.fitness_function,
-                   selection_func=args.selection_scheme,
-                   crossover_func=args.crossover_scheme,
-                   mutation_func=args.mutation_scheme,
-                   natural_fitness=args.natural_fitness,
-                   crossover_probability=args.crossover_probability,
-                   mutation_probability=args.mutation_probability,
-                   elite_count=args.elite_count,
-                   tournament_size=args.tournament_size)
-    p.gen_population()
+    population_class = ArrayPopulation if args.array else Population
+    options = dict()
+
+    if args.steady_state or args.asynchronous:
+        population_class = AsynchronousPopulation if args.asynchronous \
+            else SteadyStatePopulation
+        options = dict(offspring=args.offspring, replacement=args.replacement)
+
+    representation = Representation(args.representation)
+
+    def make_population(island=0):
+        p = population_class(representation=representation,
+                             size=args.population_size,
+                             fitness_func=args.fitness_function,
+                             selection_func=args.selection_scheme,
+                             crossover_func=args.crossover_scheme,
+                             mutation_func=args.mutation_scheme,
+                             natural_fitness=args.natural_fitness,
+                             crossover_probability=args.crossover_probability,
+                             mutation_probability=args.mutation_probability,
+                             elite_count=args.elite_count,
+                             tournament_size=args.tournament_size,
+                             evaluator=args.evaluator,
+                             fitness_cache=FitnessCache(args.cache_size)
+                             if args.cache_size > 0 else None,
+                             **options)
+        p.gen_population()
+        return p
 
     #---------------------------------------------------------------------------
-    # Run the GA
+    # Run the GA, on several islands at once if asked to
     #---------------------------------------------------------------------------
-    p.run(args.generations)
+    if args.islands > 1:
+        IslandModel(make_population, args.islands,
+                    migration_interval=args.migration_interval,
+                    migration_size=args.migration_size,
+                    topology=args.topology,
+                    termination=args.termination).run(args.generations)
+        return
+
+    checkpoint = Checkpoint(args.checkpoint, args.checkpoint_interval,
+                            resume=args.resume) if args.checkpoint else None
+
+    p = make_population()
+    p.run(args.generations, termination=args.termination,
+          checkpoint=checkpoint)
+    p.evaluator.close()
 
 #-------------------------------------------------------------------------------
 # Bootstrap
@@ -0,0 +1,365 @@
+#-------------------------------------------------------------------------------
+# Author: Justin Lewis Salmon <mccrustin@gmail.com>
+#-------------------------------------------------------------------------------
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#-------------------------------------------------------------------------------
+
+import numpy
+from itertools import izip
+from sga.batch import is_batched, to_matrix, from_matrix
+from sga.genome import Genome
+from sga.population import Population
+
+
+class Individual(object):
+    """
+    Lightweight view of a single row of an ArrayPopulation. It behaves enough
+    like a Genome for the existing selection, mutation and fitness functions
+    to be used on array-backed individuals.
+
+    A view is only valid until the population next changes. Use genome() to
+    take a standalone copy.
+    """
+    __slots__ = ('population', 'index')
+
+    def __init__(self, population, index):
+        self.population = population
+        self.index = index
+
+    def __repr__(self):
+        return repr(self.genes)
+
+    def __len__(self):
+        return self.population.genes.shape[1]
+
+    def __iter__(self):
+        return iter(self.genes)
+
+    def __getitem__(self, item):
+        return self.genes[item]
+
+    def __setitem__(self, key, value):
+        genes = list(self.genes)
+        genes[key] = value
+        self.genes = genes
+
+    @property
+    def genes(self):
+        return self.population.decode(self.index)
+
+    @genes.setter
+    def genes(self, genes):
+        self.population.encode(self.index, genes)
+
+    @property
+    def dirty(self):
+        return self.population.dirty[self.index]
+
+    @dirty.setter
+    def dirty(self, dirty):
+        self.population.dirty[self.index] = dirty
+
+    def fitness(self, recalculate=False):
+        if recalculate:
+            self.set_fitness(self.population.fitness_func(self.genes))
+
+        return self.population.fitnesses[self.index]
+
+    def set_fitness(self, raw_fitness):
+        self.population.fitnesses[self.index] = \
+            self.population.standardise(raw_fitness)
+        self.population.dirty[self.index] = False
+
+    def genome(self):
+        """
+        Return a standalone Genome holding a copy of this individual
+        """
+        genome = Genome(self.genes, self.population.representation,
+                        self.population.fitness_func,
+                        self.population.natural_fitness)
+        genome._fitness = self.fitness()
+        genome.dirty = self.dirty
+        return genome
+
+
+class ArrayPopulation(Population):
+    """
+    Population of fixed-length genomes which are all stored in a single 2-D
+    NumPy array (one genome per row, see sga.batch.to_matrix), along with a
+    vector of fitness values. Selection, crossover and mutation work on row
+    indices, and individuals are only wrapped in objects on demand.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """
+        Constructor. Takes the same parameters as Population.
+        """
+        super(ArrayPopulation, self).__init__(*args, **kwargs)
+
+        self.genes = None
+        self.fitnesses = None
+        self.dirty = None
+
+        self.elite_genes = None
+        self.elite_fitnesses = None
+        self.elite_dirty = None
+
+    def __iter__(self):
+        return (Individual(self, i) for i in xrange(len(self)))
+
+    def __len__(self):
+        return 0 if self.genes is None else len(self.genes)
+
+    def __getitem__(self, item):
+        if item < 0:
+            item += len(self)
+        return Individual(self, item)
+
+    def decode(self, index):
+        """
+        Return the genes of the given row, in the same format as the genes of
+        a Genome.
+        """
+        return from_matrix(self.genes[index:index + 1], self.representation)[0]
+
+    def encode(self, index, genes):
+        """
+        Store the given genes in the given row and mark it as dirty
+        """
+        self.genes[index] = to_matrix([genes], self.representation)[0]
+        self.dirty[index] = True
+
+    def standardise(self, raw_fitness):
+        """
+        Return the given raw fitness value(s) standardised according to the
+        natural fitness setting (see Genome.set_fitness).
+        """
+        raw_fitness = numpy.asarray(raw_fitness, dtype=numpy.float64)
+
+        if self.natural_fitness:
+            return raw_fitness
+
+        with numpy.errstate(divide='ignore'):
+            return 1.0 / raw_fitness
+
+    def take(self, indices):
+        """
+        Replace the population with the given rows of itself
+        """
+        self.genes = self.genes[indices]
+        self.fitnesses = self.fitnesses[indices]
+        self.dirty = self.dirty[indices]
+
+    def get_state(self):
+        """
+        The array of genes is stored as it is, so it can't hold individuals of
+        different lengths
+        """
+        state = self.get_counters()
+        state.update(gene_kind='array', genes=self.genes,
+                     fitnesses=self.fitnesses, dirty=self.dirty)
+        return state
+
+    def set_state(self, state, gene_class=None):
+        if str(state['gene_kind']) != 'array':
+            raise ValueError('checkpoint was not saved by an ArrayPopulation')
+
+        self.genes = state['genes']
+        self.fitnesses = state['fitnesses']
+        self.dirty = state['dirty']
+        self.set_counters(state)
+
+    def gen_population(self):
+        """
+        Generate an initial, random population based on the given representation
+        dictionary.
+        """
+        r = self.representation
+        shape = (self.size, r.length)
+
+        if r.type == 'binary':
+            genes = numpy.random.randint(0, 2, shape).astype(numpy.uint8)
+
+        elif r.type == 'float':
+            genes = numpy.random.uniform(r.min, r.max, shape)
+
+        elif r.type == 'int':
+            genes = numpy.random.randint(r.min, r.max + 1, shape) \
+                .astype(numpy.int64)
+
+        elif r.type == 'enum':
+            if r.duplicates:
+                genes = numpy.random.randint(0, len(r.values), shape) \
+                    .astype(numpy.int64)
+            else:
+                #---------------------------------------------------------------
+                # Each row is a random permutation of all of the values
+                #---------------------------------------------------------------
+                genes = numpy.argsort(
+                    numpy.random.random((self.size, len(r.values))), axis=1)
+
+        else:
+            raise ValueError('representation type %s cannot be stored as an '
+                             'array' % r.type)
+
+        self.genes = genes
+        self.fitnesses = numpy.zeros(self.size)
+        self.dirty = numpy.ones(self.size, dtype=bool)
+
+    def dirty_individuals(self):
+        return [Individual(self, i) for i in numpy.flatnonzero(self.dirty)]
+
+    def apply_deltas(self, individuals):
+        """
+        Rows don't record the moves made to them, so every dirty row is
+        evaluated in full
+        """
+        return individuals
+
+    def evaluate(self, individuals):
+        if not is_batched(self.fitness_func):
+            return super(ArrayPopulation, self).evaluate(individuals)
+
+        #-----------------------------------------------------------------------
+        # Batched fitness functions can take the rows straight out of the array
+        #-----------------------------------------------------------------------
+        rows = numpy.array([i.index for i in individuals], dtype=numpy.intp)
+        raw_fitnesses = numpy.asarray(self.fitness_func(self.genes[rows])) \
+            if len(rows) else numpy.empty(0)
+
+        self.fitnesses[rows] = self.standardise(raw_fitnesses)
+        self.dirty[rows] = False
+        self.evaluations += len(rows)
+
+        return raw_fitnesses.tolist()
+
+    def total_fitness(self):
+        return self.fitnesses.sum()
+
+    def mean_fitness(self):
+        return self.fitnesses.mean()
+
+    def max_individual(self):
+        return Individual(self, self.fitnesses.argmax())
+
+    def min_individual(self):
+        return Individual(self, self.fitnesses.argmin())
+
+    def store_elites(self):
+        """
+        Perform elitism by withholding a certain number of the fittest rows
+        from selection/crossover/mutation.
+        """
+        if not self.elite_count:
+            self.elite_genes = None
+            return
+
+        elites = numpy.argpartition(-self.fitnesses, self.elite_count - 1) \
+            [:self.elite_count]
+
+        self.elite_genes = self.genes[elites]
+        self.elite_fitnesses = self.fitnesses[elites]
+        self.elite_dirty = self.dirty[elites]
+
+        rest = numpy.ones(len(self), dtype=bool)
+        rest[elites] = False
+        self.take(rest)
+
+    def load_elites(self):
+        """
+        Re-add the withheld elite rows back into the population
+        """
+        if self.elite_genes is None:
+            return
+
+        self.genes = numpy.concatenate((self.genes, self.elite_genes))
+        self.fitnesses = numpy.concatenate((self.fitnesses,
+                                            self.elite_fitnesses))
+        self.dirty = numpy.concatenate((self.dirty, self.elite_dirty))
+
+    def select_parents(self):
+        """
+        Perform population selection using the user-supplied selection
+        function. Vectorized selection functions work directly on the fitness
+        array, others see each row as an Individual.
+        """
+        if is_batched(self.selection_func):
+            self.take(self.selection_func(self.fitnesses,
+                                          tournament_size=self.tournament_size))
+            return
+
+        selected = self.selection_func(self)
+        self.take(numpy.array([i.index for i in selected], dtype=numpy.intp))
+
+    def fitness_array(self):
+        return self.fitnesses
+
+    def crossover(self, probability):
+        """
+        Perform crossover on each pair of rows using the user-supplied crossover
+        function. Vectorized crossover functions are given all of the chosen
+        pairs at once.
+
+        :param probability: the probability that crossover will occur for each
+                            pair of individuals
+        """
+        pairs = len(self) // 2
+        males = 2 * numpy.flatnonzero(numpy.random.random(pairs) <= probability)
+        females = males + 1
+
+        old_males = self.genes[males]
+        old_females = self.genes[females]
+        dirty = self.dirty.copy()
+
+        if is_batched(self.crossover_func):
+            self.genes[males], self.genes[females] = \
+                self.crossover_func(old_males, old_females)
+        else:
+            for male, female in izip(males, females):
+                child1, child2 = self.crossover_func(self.decode(male),
+                                                     self.decode(female))
+                self.encode(male, child1)
+                self.encode(female, child2)
+
+        #-----------------------------------------------------------------------
+        # Only re-evaluate the children if they actually changed
+        #-----------------------------------------------------------------------
+        self.dirty = dirty
+        self.dirty[males] |= (self.genes[males] != old_males).any(axis=1)
+        self.dirty[females] |= (self.genes[females] != old_females).any(axis=1)
+
+    def mutate(self, probability):
+        """
+        Perform mutation on each row using the user-supplied mutation function.
+        Vectorized mutation functions are given the whole array at once.
+
+        :param probability: the probability that mutation will occur for each
+                            individual
+        """
+        old_genes = self.genes.copy()
+        dirty = self.dirty.copy()
+
+        if is_batched(self.mutation_func):
+            self.genes = self.mutation_func(old_genes, probability)
+        else:
+            for individual in self:
+                genes = self.mutation_func(individual, probability)
+
+                if genes is not individual:
+                    individual.genes = genes
+
+        #-----------------------------------------------------------------------
+        # Only re-evaluate the rows which the mutation actually changed
+        #-----------------------------------------------------------------------
+        self.dirty = dirty | (self.genes != old_genes).any(axis=1)
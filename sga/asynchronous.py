@@ -0,0 +1,132 @@
+#-------------------------------------------------------------------------------
+# Author: Justin Lewis Salmon <mccrustin@gmail.com>
+#-------------------------------------------------------------------------------
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#-------------------------------------------------------------------------------
+
+from Queue import Queue, Empty
+from sga.batch import is_batched
+from sga.steadystate import SteadyStatePopulation
+
+
+class AsynchronousPopulation(SteadyStatePopulation):
+    """
+    Steady-state population whose offspring are evaluated in the background
+    by the evaluator's workers, in whatever order they finish. Whenever an
+    evaluation finishes, the child is inserted into the population and a new
+    one is bred from the individuals which have been evaluated so far and sent
+    off in its place, so that no worker waits for a slow evaluation to finish.
+
+    Use a parallel evaluator (see sga.evaluator). With the serial evaluator,
+    this is the same as a SteadyStatePopulation.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """
+        Constructor. Takes the same parameters as SteadyStatePopulation, plus:
+
+        :param in_flight: the number of evaluations to keep running at once
+                          (default: twice the number of workers)
+        """
+        in_flight = kwargs.pop('in_flight', None)
+
+        super(AsynchronousPopulation, self).__init__(*args, **kwargs)
+
+        if is_batched(self.fitness_func):
+            raise ValueError('asynchronous populations evaluate one genome at '
+                             'a time, so cannot use batched fitness functions')
+
+        self.in_flight = in_flight if in_flight \
+            else 2 * self.evaluator.workers
+
+        self.completed = Queue()
+        self.pending = dict()
+
+    def step(self):
+        """
+        Insert as many evaluated offspring as there are individuals in the
+        population, as their evaluations finish
+        """
+        for _ in xrange(len(self)):
+            self.submit_offspring()
+
+            child, raw_fitness = self.next_completed()
+            child.set_fitness(raw_fitness)
+            self.evaluations += 1
+
+            if self.fitness_cache is not None:
+                self.fitness_cache.put(self.fitness_cache.key(child.genes),
+                                       raw_fitness)
+
+            self.insert(child)
+
+        self.generation += 1
+
+    def submit_offspring(self):
+        """
+        Breed new offspring and send them off to be evaluated, until enough
+        evaluations are running
+        """
+        while len(self.pending) < self.in_flight:
+            children = self.make_offspring()
+
+            if self.local_search is not None:
+                self.improve(children)
+
+            for child in children:
+                #---------------------------------------------------------------
+                # Children which didn't change, whose fitness can be updated
+                # incrementally or whose genotype is in the fitness cache
+                # don't need to be sent to a worker
+                #---------------------------------------------------------------
+                if child.dirty and self.fitness_delta is not None:
+                    self.apply_deltas([child])
+
+                if child.dirty and self.fitness_cache is not None:
+                    raw_fitness = self.fitness_cache.get(
+                        self.fitness_cache.key(child.genes))
+                    if raw_fitness is not None:
+                        child.set_fitness(raw_fitness)
+
+                if not child.dirty:
+                    self.insert(child)
+                    continue
+
+                self.pending[id(child)] = None
+                self.pending[id(child)] = self.evaluator.submit(
+                    self.fitness_func, child.genes,
+                    lambda raw_fitness, child=child:
+                    self.completed.put((child, raw_fitness)))
+
+    def next_completed(self):
+        """
+        Wait for the next evaluation to finish, and return the child and its
+        raw fitness value
+        """
+        while True:
+            try:
+                child, raw_fitness = self.completed.get(timeout=0.1)
+            except Empty:
+                #---------------------------------------------------------------
+                # A failed evaluation never calls back, so look for one and
+                # raise its error here
+                #---------------------------------------------------------------
+                for result in self.pending.values():
+                    if result is not None and result.ready() \
+                            and not result.successful():
+                        result.get()
+                continue
+
+            del self.pending[id(child)]
+            return child, raw_fitness
@@ -0,0 +1,99 @@
+#-------------------------------------------------------------------------------
+# Author: Justin Lewis Salmon <mccrustin@gmail.com>
+#-------------------------------------------------------------------------------
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#-------------------------------------------------------------------------------
+
+import numpy
+
+
+def batched(func):
+    """
+    Decorator which marks a function as operating on a whole population at
+    once, rather than on a single genome. The genomes are passed as a 2-D
+    array with one genome per row (see to_matrix()).
+    """
+    func.batched = True
+    return func
+
+
+def is_batched(func):
+    """
+    Return whether the given function was marked with @batched
+    """
+    return getattr(func, 'batched', False)
+
+
+def to_matrix(genes, representation):
+    """
+    Return the given list of genes as a 2-D array, with one genome per row.
+    Only fixed-length representations can be converted:
+
+        binary: uint8 array of 0s and 1s
+        int:    int64 array of values
+        float:  float64 array of values
+        enum:   int64 array of indices into representation.values
+
+    :param          genes: the genes of each genome
+    :param representation: the representation shared by all of the genomes
+    """
+    if not len(genes):
+        return numpy.empty((0, representation.length))
+
+    if representation.type == 'binary':
+        #-----------------------------------------------------------------------
+        # Some operators (e.g. crossover.uniform) return binary genes as a list
+        # of characters rather than a string
+        #-----------------------------------------------------------------------
+        matrix = numpy.fromstring(''.join(''.join(g) for g in genes),
+                                  dtype=numpy.uint8) - ord('0')
+        return matrix.reshape(len(genes), -1)
+
+    if representation.type == 'int':
+        return numpy.array(genes, dtype=numpy.int64)
+
+    if representation.type == 'float':
+        return numpy.array(genes, dtype=numpy.float64)
+
+    if representation.type == 'enum':
+        index = dict((value, i) for i, value
+                     in enumerate(representation.values))
+        return numpy.array([[index[g] for g in genome] for genome in genes],
+                           dtype=numpy.int64)
+
+    raise ValueError('representation type %s cannot be batched'
+                     % representation.type)
+
+
+def from_matrix(matrix, representation):
+    """
+    Return the genes of each row of the given 2-D array, in the same format
+    as the genes of a Genome. This is the inverse of to_matrix().
+
+    :param         matrix: 2-D array with one genome per row
+    :param representation: the representation shared by all of the genomes
+    """
+    if representation.type == 'binary':
+        return [(row + ord('0')).astype(numpy.uint8).tostring()
+                for row in matrix]
+
+    if representation.type in ('int', 'float'):
+        return matrix.tolist()
+
+    if representation.type == 'enum':
+        values = representation.values
+        return [[values[i] for i in row] for row in matrix.tolist()]
+
+    raise ValueError('representation type %s cannot be batched'
+                     % representation.type)
@@ -0,0 +1,101 @@
+#-------------------------------------------------------------------------------
+# Author: Justin Lewis Salmon <mccrustin@gmail.com>
+#-------------------------------------------------------------------------------
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#-------------------------------------------------------------------------------
+
+from collections import OrderedDict
+from classifier.gene import Gene
+from sga.packed import PackedBinary
+
+
+class FitnessCache(object):
+    """
+    Bounded cache of raw fitness values, keyed by genotype. When the cache is
+    full, the least recently used entry is evicted.
+    """
+
+    def __init__(self, max_size):
+        """
+        Constructor
+
+        :param max_size: the maximum number of genotypes to remember
+        """
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __repr__(self):
+        return 'FitnessCache(size=%d/%d, hits=%d, misses=%d)' \
+               % (len(self), self.max_size, self.hits, self.misses)
+
+    @staticmethod
+    def key(genes):
+        """
+        Return a hashable key which uniquely identifies the given genes. For
+        Gene-based genomes, the key is made from the alleles and class label
+        of each gene.
+
+        :param genes: the genes of a single genome
+        """
+        if isinstance(genes, (basestring, PackedBinary)):
+            return genes
+
+        if len(genes) and isinstance(genes[0], Gene):
+            return tuple((tuple(gene.alleles), gene.class_label)
+                         for gene in genes)
+
+        return tuple(genes)
+
+    def get(self, key):
+        """
+        Return the raw fitness value stored for the given key, or None if there
+        isn't one.
+
+        :param key: a key as returned by FitnessCache.key()
+        """
+        try:
+            raw_fitness = self.entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return None
+
+        #-----------------------------------------------------------------------
+        # Re-insert the entry to mark it as the most recently used
+        #-----------------------------------------------------------------------
+        self.entries[key] = raw_fitness
+        self.hits += 1
+        return raw_fitness
+
+    def put(self, key, raw_fitness):
+        """
+        Store the raw fitness value for the given key, evicting the least
+        recently used entry if the cache is full.
+
+        :param         key: a key as returned by FitnessCache.key()
+        :param raw_fitness: the fitness value as returned by the user-specified
+                            fitness function
+        """
+        self.entries.pop(key, None)
+        self.entries[key] = raw_fitness
+
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
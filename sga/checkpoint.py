@@ -0,0 +1,276 @@
+#-------------------------------------------------------------------------------
+# Author: Justin Lewis Salmon <mccrustin@gmail.com>
+#-------------------------------------------------------------------------------
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#-------------------------------------------------------------------------------
+
+import numpy
+import os
+import random
+from sga.packed import PackedBinary
+
+#-------------------------------------------------------------------------------
+# Checkpoints are NumPy .npz files of plain arrays, never pickled objects. The
+# version is bumped whenever the layout changes incompatibly.
+#-------------------------------------------------------------------------------
+FORMAT_VERSION = 1
+
+
+def pack(sequences, dtype):
+    """
+    Return the given sequences, which may have different lengths or be None,
+    as a tuple of a vector of their lengths (-1 for None) and a flat array of
+    their concatenated elements. This is the inverse of unpack().
+
+    :param sequences: the sequences to pack
+    :param     dtype: the NumPy type of the elements
+    """
+    lengths = numpy.array([-1 if s is None else len(s) for s in sequences],
+                          dtype=numpy.int64)
+    flat = numpy.array([e for s in sequences if s is not None for e in s],
+                       dtype=dtype)
+
+    return lengths, flat
+
+
+def unpack(lengths, flat):
+    """
+    Return the list of arrays (or None) packed by pack()
+
+    :param lengths: the length of each sequence, -1 for None
+    :param    flat: the concatenated elements of every sequence
+    """
+    ends = numpy.cumsum(numpy.maximum(lengths, 0))
+
+    return [None if length < 0 else flat[end - length:end]
+            for length, end in zip(lengths.tolist(), ends.tolist())]
+
+
+def encode_genes(genes, representation):
+    """
+    Return the genes of each genome, which may have different lengths, as a
+    dictionary of arrays (see decode_genes). Binary genes, and any others made
+    of single characters, are stored as their characters, so may include e.g.
+    '#', along with whether each genome was a string or a list of characters.
+    Other enum genes are stored as indices into representation.values, and
+    rules (genes made of objects with alleles,
+    mutation_step_sizes and class_label, e.g. classifier.gene.Gene) as their
+    attributes.
+
+    :param          genes: the genes of each genome
+    :param representation: the representation shared by all of the genomes
+    """
+    lengths = numpy.array([len(g) for g in genes], dtype=numpy.int64)
+    elements = [e for g in genes for e in g]
+
+    if elements and hasattr(elements[0], 'alleles'):
+        rule_lengths, alleles = pack([e.alleles for e in elements],
+                                     numpy.float64)
+        step_size_lengths, step_sizes = pack(
+            [e.mutation_step_sizes for e in elements], numpy.float64)
+
+        return dict(gene_kind='rules', gene_lengths=lengths,
+                    rule_lengths=rule_lengths, alleles=alleles,
+                    step_size_lengths=step_size_lengths,
+                    step_sizes=step_sizes,
+                    class_labels=numpy.array([e.class_label
+                                              for e in elements],
+                                             dtype=numpy.int64))
+
+    if representation.type in ('binary', 'packed_binary') \
+            or all(isinstance(e, str) and len(e) == 1 for e in elements):
+        flat = numpy.frombuffer(''.join(''.join(g) for g in genes),
+                                dtype=numpy.uint8)
+        kind = 'packed_binary' if representation.type == 'packed_binary' \
+            else 'chars'
+
+        return dict(gene_kind=kind, gene_lengths=lengths, genes=flat,
+                    gene_lists=numpy.array([isinstance(g, list)
+                                            for g in genes], dtype=bool))
+
+    if representation.type == 'int':
+        flat = numpy.array(elements, dtype=numpy.int64)
+    elif representation.type == 'float':
+        flat = numpy.array(elements, dtype=numpy.float64)
+    elif representation.type == 'enum':
+        index = dict((value, i) for i, value
+                     in enumerate(representation.values))
+        flat = numpy.array([index[e] for e in elements], dtype=numpy.int64)
+    else:
+        raise ValueError('representation type %s cannot be checkpointed'
+                         % representation.type)
+
+    return dict(gene_kind=representation.type, gene_lengths=lengths,
+                genes=flat)
+
+
+def decode_genes(state, representation, gene_class=None):
+    """
+    Return the genes of each genome from the given dictionary of arrays, in
+    the same format as the genes of a Genome. This is the inverse of
+    encode_genes().
+
+    :param          state: the arrays returned by encode_genes
+    :param representation: the representation shared by all of the genomes
+    :param     gene_class: the class of each rule, if the genes are rules. It
+                           is called with the alleles of the rule.
+    """
+    kind = str(state['gene_kind'])
+    lengths = state['gene_lengths']
+
+    if kind == 'rules':
+        if gene_class is None:
+            raise ValueError('a gene class is needed to restore rules')
+
+        rules = list()
+        for alleles, step_sizes, label in zip(
+                unpack(state['rule_lengths'], state['alleles']),
+                unpack(state['step_size_lengths'], state['step_sizes']),
+                state['class_labels'].tolist()):
+            rule = gene_class(alleles.tolist())
+            rule.mutation_step_sizes = None if step_sizes is None \
+                else step_sizes.tolist()
+            rule.class_label = label
+            rules.append(rule)
+
+        ends = numpy.cumsum(lengths).tolist()
+        return [rules[end - length:end]
+                for length, end in zip(lengths.tolist(), ends)]
+
+    genes = unpack(lengths, state['genes'])
+
+    if kind == 'chars':
+        return [list(g.tostring()) if is_list else g.tostring()
+                for g, is_list in zip(genes, state['gene_lists'].tolist())]
+
+    if kind == 'packed_binary':
+        return [PackedBinary.from_string(g.tostring()) for g in genes]
+
+    if kind in ('int', 'float'):
+        return [g.tolist() for g in genes]
+
+    if kind == 'enum':
+        values = representation.values
+        return [[values[i] for i in g.tolist()] for g in genes]
+
+    raise ValueError('unknown gene kind in checkpoint: %s' % kind)
+
+
+class Checkpoint(object):
+    """
+    Periodically saves the state of a population to a file, from which a later
+    run can carry on where it left off (see Population.run). The state
+    includes the genes, fitness values and strategy parameters of every
+    individual, the generation and evaluation counters, the plotter history
+    and the state of the random number generators, so a resumed generational
+    run makes the same choices as one which was never interrupted. (The heap
+    of a SteadyStatePopulation is rebuilt, so ties may be broken differently.)
+
+    Not included are the contents of the fitness cache, which refills as the
+    run goes on, and any state kept by the fitness, selection, crossover or
+    mutation functions themselves.
+    """
+
+    def __init__(self, path, interval=10, resume=False, gene_class=None):
+        """
+        Constructor
+
+        :param       path: the file to save the checkpoints to
+        :param   interval: the number of generations between checkpoints. A
+                           checkpoint is also saved at the end of the run.
+        :param     resume: restore the population from the file at the start
+                           of the run, if the file exists
+        :param gene_class: the class of each rule, if the genes are made of
+                           rules (see decode_genes)
+        """
+        self.path = path
+        self.interval = interval
+        self.resume = resume
+        self.gene_class = gene_class
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def due(self, population):
+        """
+        Return whether a checkpoint should be saved at the current generation
+        of the given population
+        """
+        return bool(self.interval) \
+            and population.generation % self.interval == 0
+
+    def save(self, population):
+        """
+        Save the state of the given population and of the random number
+        generators
+
+        :param population: the population to save
+        """
+        state = population.get_state()
+
+        version, internal, gauss = random.getstate()
+        state['random_version'] = version
+        state['random_state'] = numpy.array(internal, dtype=numpy.uint32)
+        state['random_gauss'] = numpy.nan if gauss is None else gauss
+
+        name, keys, position, has_gauss, cached = numpy.random.get_state()
+        state['numpy_random_keys'] = keys
+        state['numpy_random_state'] = numpy.array(
+            [position, has_gauss, cached], dtype=numpy.float64)
+
+        state['version'] = FORMAT_VERSION
+
+        #-----------------------------------------------------------------------
+        # Write to a temporary file first, so that a run which is killed while
+        # saving leaves the previous checkpoint intact
+        #-----------------------------------------------------------------------
+        temp_file = '%s.%d.tmp' % (self.path, os.getpid())
+        try:
+            with open(temp_file, 'wb') as f:
+                numpy.savez_compressed(f, **state)
+                f.flush()
+                os.fsync(f.fileno())
+            os.rename(temp_file, self.path)
+        except:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+            raise
+
+    def load(self, population):
+        """
+        Restore the state of the given population and of the random number
+        generators from the file
+
+        :param population: the population to restore, which must have been
+                           made with the same settings as the saved one
+        """
+        with open(self.path, 'rb') as f:
+            archive = numpy.load(f)
+            state = dict((key, archive[key]) for key in archive.files)
+            archive.close()
+
+        if int(state['version']) != FORMAT_VERSION:
+            raise ValueError('unsupported checkpoint version %d in %s'
+                             % (state['version'], self.path))
+
+        population.set_state(state, gene_class=self.gene_class)
+
+        gauss = float(state['random_gauss'])
+        random.setstate((int(state['random_version']),
+                         tuple(state['random_state'].tolist()),
+                         None if numpy.isnan(gauss) else gauss))
+
+        position, has_gauss, cached = state['numpy_random_state'].tolist()
+        numpy.random.set_state(('MT19937', state['numpy_random_keys'],
+                                int(position), int(has_gauss), cached))
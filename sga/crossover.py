@@ -15,9 +15,14 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #-------------------------------------------------------------------------------
 
+import numpy
 import random
+from sga.batch import batched
+from sga.genome import cow_safe
+from sga.packed import PackedBinary
 
 
+@cow_safe
 def single_point(male, female):
     """
     Return two new children after performing single point crossover
@@ -28,6 +33,9 @@ def single_point(male, female):
     """
     crossover_point = random.randint(0, len(male))
 
+    if isinstance(male, PackedBinary):
+        return _packed_crossover(male, female, male.head_mask(crossover_point))
+
     # sexy time
     child1 = male[:crossover_point] + female[crossover_point:]
     child2 = male[crossover_point:] + female[:crossover_point]
@@ -35,6 +43,7 @@ def single_point(male, female):
     return child1, child2
 
 
+@cow_safe
 def uniform(male, female):
     """
     Return two new children after performing uniform crossover
@@ -44,6 +53,12 @@ def uniform(male, female):
     :returns:      tuple containing two newly crossed-over children
     """
     ratio = 0.5
+
+    if isinstance(male, PackedBinary):
+        return _packed_crossover(male, female,
+                                 random.getrandbits(len(male)) if len(male)
+                                 else 0)
+
     child1 = list()
     child2 = list()
 
@@ -58,6 +73,231 @@ def uniform(male, female):
     return child1, child2
 
 
+def _packed_crossover(male, female, mask):
+    """
+    Return two new packed binary children, taking the genes selected by the
+    given mask from one parent and the rest from the other
+
+    :param   male: the first parent
+    :param female: the second parent
+    :param   mask: integer mask of the genes to take from the male for the
+                   first child
+    """
+    other = male.full_mask() ^ mask
+
+    return (PackedBinary((male.bits & mask) | (female.bits & other), len(male)),
+            PackedBinary((female.bits & mask) | (male.bits & other), len(male)))
+
+
+@cow_safe
 def noop(male, female):
     """Empty crossover function"""
     return male, female
+
+
+#-------------------------------------------------------------------------------
+# Permutation crossover schemes, for "enum" representations without duplicates.
+# Each child is another ordering of the parents' values, so these are safe to
+# use for e.g. TSP tours. The parents are first relabelled as permutations of
+# 0..n-1, so that the position of each value can be found in an array lookup.
+#-------------------------------------------------------------------------------
+
+def _relabel(male, female):
+    """
+    Return the values of the given parents, and both parents as lists of
+    indices into those values
+    """
+    values = list(male)
+    index = dict((value, i) for i, value in enumerate(values))
+
+    return values, range(len(values)), [index[value] for value in female]
+
+
+def _positions(parent):
+    """
+    Return the position of each value in the given relabelled parent
+    """
+    positions = [0] * len(parent)
+    for i, value in enumerate(parent):
+        positions[value] = i
+
+    return positions
+
+
+def _cut_points(length):
+    """
+    Return two random cut points 0 <= a <= b <= length
+    """
+    a, b = random.randint(0, length), random.randint(0, length)
+    return min(a, b), max(a, b)
+
+
+@cow_safe
+def order(male, female):
+    """
+    Return two new children after performing order crossover (OX). Each child
+    keeps a random segment of one parent in place, and the remaining values
+    are filled in starting after the segment, in the order they appear in the
+    other parent.
+
+    :param   male: the first parent
+    :param female: the second parent
+    :returns:      tuple containing two newly crossed-over children
+    """
+    values, male, female = _relabel(male, female)
+    n = len(values)
+    a, b = _cut_points(n)
+
+    def child(parent, other):
+        genes = parent[:]
+        used = [False] * n
+        for value in parent[a:b]:
+            used[value] = True
+
+        position = b
+        for i in xrange(b, b + n):
+            value = other[i % n]
+            if not used[value]:
+                genes[position % n] = value
+                position += 1
+
+        return [values[value] for value in genes]
+
+    return child(male, female), child(female, male)
+
+
+@cow_safe
+def partially_mapped(male, female):
+    """
+    Return two new children after performing partially mapped crossover
+    (PMX). Each child takes a random segment from one parent and the rest
+    from the other, with values which would appear twice replaced by
+    following the mapping between the two segments.
+
+    :param   male: the first parent
+    :param female: the second parent
+    :returns:      tuple containing two newly crossed-over children
+    """
+    values, male, female = _relabel(male, female)
+    a, b = _cut_points(len(values))
+
+    def child(parent, other):
+        positions = _positions(parent)
+        genes = other[:]
+        genes[a:b] = parent[a:b]
+
+        for i in xrange(len(genes)):
+            if a <= i < b:
+                continue
+
+            value = other[i]
+            while a <= positions[value] < b:
+                value = other[positions[value]]
+            genes[i] = value
+
+        return [values[value] for value in genes]
+
+    return child(male, female), child(female, male)
+
+
+@cow_safe
+def edge_recombination(male, female):
+    """
+    Return two new children after performing edge recombination crossover
+    (ERX). Each child is built from the edges (adjacent values, treating the
+    genome as a cycle) of both parents, always moving to the neighbour with
+    the fewest remaining edges, so that as few new edges as possible are
+    introduced. The children start from the first value of each parent.
+
+    :param   male: the first parent
+    :param female: the second parent
+    :returns:      tuple containing two newly crossed-over children
+    """
+    values, male, female = _relabel(male, female)
+    n = len(values)
+
+    if n < 3:
+        return [values[value] for value in male], \
+            [values[value] for value in female]
+
+    def child(start):
+        edges = [set() for _ in xrange(n)]
+        for parent in (male, female):
+            for i, value in enumerate(parent):
+                edges[value].add(parent[i - 1])
+                edges[value].add(parent[(i + 1) % n])
+
+        #-----------------------------------------------------------------------
+        # Unvisited values, with the position of each so that they can be
+        # removed in O(1)
+        #-----------------------------------------------------------------------
+        unvisited = range(n)
+        positions = range(n)
+
+        genes = list()
+        value = start
+
+        while True:
+            genes.append(value)
+
+            last = unvisited.pop()
+            if last != value:
+                unvisited[positions[value]] = last
+                positions[last] = positions[value]
+
+            if not unvisited:
+                break
+
+            for neighbour in edges[value]:
+                edges[neighbour].discard(value)
+
+            if edges[value]:
+                fewest = min(len(edges[neighbour])
+                             for neighbour in edges[value])
+                value = random.choice([neighbour for neighbour in edges[value]
+                                       if len(edges[neighbour]) == fewest])
+            else:
+                value = random.choice(unvisited)
+
+        return [values[value] for value in genes]
+
+    return child(male[0]), child(female[0])
+
+
+#-------------------------------------------------------------------------------
+# Vectorized crossover schemes. These take the genes of the first and second
+# parent of every pair as two 2-D arrays, one genome per row (see
+# sga.batch.to_matrix), and return the two arrays of children.
+#-------------------------------------------------------------------------------
+
+@batched
+def batch_single_point(males, females):
+    """
+    Vectorized single point crossover, with one random crossover point per
+    pair. Unlike single_point(), the second child is always the head of the
+    female followed by the tail of the male.
+
+    :param   males: the first parent of each pair
+    :param females: the second parent of each pair
+    :returns:       tuple containing the two arrays of children
+    """
+    crossover_points = numpy.random.randint(0, males.shape[1] + 1,
+                                            (len(males), 1))
+    mask = numpy.arange(males.shape[1]) < crossover_points
+
+    return numpy.where(mask, males, females), numpy.where(mask, females, males)
+
+
+@batched
+def batch_uniform(males, females):
+    """
+    Vectorized uniform crossover, using a single random mask for all pairs
+
+    :param   males: the first parent of each pair
+    :param females: the second parent of each pair
+    :returns:       tuple containing the two arrays of children
+    """
+    ratio = 0.5
+    mask = numpy.random.random(males.shape) > ratio
+
+    return numpy.where(mask, males, females), numpy.where(mask, females, males)
@@ -0,0 +1,187 @@
+#-------------------------------------------------------------------------------
+# Author: Justin Lewis Salmon <mccrustin@gmail.com>
+#-------------------------------------------------------------------------------
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#-------------------------------------------------------------------------------
+
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+#-------------------------------------------------------------------------------
+# The fitness function used by a process pool worker. This is set once when
+# each worker starts rather than being sent along with every batch of genes,
+# since bound methods (e.g. RealValueClassifier.fitness_func) can't be pickled.
+#-------------------------------------------------------------------------------
+_worker_fitness_func = None
+
+
+def _init_worker(fitness_func):
+    global _worker_fitness_func
+    _worker_fitness_func = fitness_func
+
+
+def _evaluate(genes):
+    return _worker_fitness_func(genes)
+
+
+class SerialEvaluator(object):
+    """
+    Evaluates the fitness of each genome one after another in the calling
+    process.
+    """
+
+    def __init__(self, workers=None):
+        """
+        Constructor
+
+        :param workers: ignored, accepted so that all evaluators can be
+                        constructed in the same way
+        """
+        self.workers = 1
+
+    def evaluate(self, fitness_func, genomes):
+        """
+        Return the raw fitness value of each of the given genomes, in the same
+        order as the genomes were given.
+
+        :param fitness_func: the user-specified fitness function
+        :param      genomes: the genomes to evaluate
+        """
+        return [fitness_func(genome.genes) for genome in genomes]
+
+    def submit(self, fitness_func, genes, callback):
+        """
+        Start calculating the raw fitness value of the given genes, and call
+        the given function with it when it is ready. This evaluator calls it
+        straight away, but the pool evaluators call it later, from a
+        background thread.
+
+        :param fitness_func: the user-specified fitness function
+        :param        genes: the genes to evaluate
+        :param     callback: function to call with the raw fitness value
+        :returns:            an AsyncResult for the evaluation, or None if it
+                             has already finished
+        """
+        callback(fitness_func(genes))
+        return None
+
+    def close(self):
+        """
+        Release any resources held by this evaluator
+        """
+        pass
+
+
+class PoolEvaluator(SerialEvaluator):
+    """
+    Base class for evaluators which farm batches of genomes out to a pool of
+    workers.
+    """
+
+    def __init__(self, workers=None):
+        """
+        Constructor
+
+        :param workers: the number of workers to use (default: the number of
+                        CPUs on this machine)
+        """
+        self.workers = workers if workers else multiprocessing.cpu_count()
+        self.pool = None
+        self.fitness_func = None
+
+    def evaluate(self, fitness_func, genomes):
+        genes = [genome.genes for genome in genomes]
+
+        if len(genes) < 2:
+            return [fitness_func(g) for g in genes]
+
+        #-----------------------------------------------------------------------
+        # Send a few batches to each worker, so that the per-task overhead is
+        # amortised but a slow batch doesn't leave the other workers idle
+        #-----------------------------------------------------------------------
+        chunksize = max(1, len(genes) // (self.workers * 4))
+        return self.map(fitness_func, genes, chunksize)
+
+    def map(self, fitness_func, genes, chunksize):
+        raise NotImplementedError
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+
+class ThreadPoolEvaluator(PoolEvaluator):
+    """
+    Evaluates genomes in a pool of threads. Only useful when the fitness
+    function spends most of its time outside of the GIL (e.g. in NumPy or
+    nogil Cython code).
+    """
+
+    def map(self, fitness_func, genes, chunksize):
+        return self.start().map(fitness_func, genes, chunksize)
+
+    def submit(self, fitness_func, genes, callback):
+        return self.start().apply_async(fitness_func, (genes,),
+                                        callback=callback)
+
+    def start(self):
+        """
+        Return the pool of threads, starting it if necessary
+        """
+        if self.pool is None:
+            self.pool = ThreadPool(self.workers)
+
+        return self.pool
+
+
+class ProcessPoolEvaluator(PoolEvaluator):
+    """
+    Evaluates genomes in a pool of worker processes. The genes of each genome
+    are pickled and sent to the workers, and the raw fitness values are sent
+    back.
+    """
+
+    def map(self, fitness_func, genes, chunksize):
+        return self.start(fitness_func).map(_evaluate, genes, chunksize)
+
+    def submit(self, fitness_func, genes, callback):
+        return self.start(fitness_func).apply_async(_evaluate, (genes,),
+                                                    callback=callback)
+
+    def start(self, fitness_func):
+        """
+        Return the pool of worker processes for the given fitness function,
+        starting it if necessary
+        """
+        #-----------------------------------------------------------------------
+        # The workers are bound to a single fitness function when they start,
+        # so start a new pool if we are asked to use a different one
+        #-----------------------------------------------------------------------
+        if self.pool is not None and fitness_func != self.fitness_func:
+            self.close()
+
+        if self.pool is None:
+            self.fitness_func = fitness_func
+            self.pool = multiprocessing.Pool(self.workers,
+                                             initializer=_init_worker,
+                                             initargs=(fitness_func,))
+
+        return self.pool
+
+
+EVALUATORS = {'serial': SerialEvaluator,
+              'thread': ThreadPoolEvaluator,
+              'process': ProcessPoolEvaluator}
@@ -15,6 +15,8 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #-------------------------------------------------------------------------------
 from itertools import izip
+from sga.batch import batched
+from sga.packed import PackedBinary
 
 
 def all_ones(genome):
@@ -25,6 +27,9 @@ def all_ones(genome):
     :param genome: the individual genome to evaluate
     :returns:      the number of 1s in the genome
     """
+    if isinstance(genome, PackedBinary):
+        return genome.count()
+
     return len([i for i in genome if int(i) == 1])
 
 
@@ -60,3 +65,44 @@ def all_a(genome):
     Return the number of "a"s in the given genome
     """
     return len([i for i in genome if i == 'a'])
+
+
+#-------------------------------------------------------------------------------
+# Batched versions of the above, which take a whole population as a 2-D array
+# with one genome per row (see sga.batch.to_matrix) and return an array of
+# fitness values.
+#-------------------------------------------------------------------------------
+
+@batched
+def batch_all_ones(genomes):
+    """
+    Batched version of all_ones()
+
+    :param genomes: 2-D array of binary genomes
+    :returns:       the number of 1s in each genome
+    """
+    return genomes.sum(axis=1)
+
+
+@batched
+def batch_matching_bits(genomes):
+    """
+    Batched version of matching_bits()
+
+    :param genomes: 2-D array of binary genomes
+    :returns:       the number of consecutive pairs of matching bits in each
+                    genome
+    """
+    pairs = genomes.shape[1] // 2
+    return (genomes[:, 0:2 * pairs:2] == genomes[:, 1:2 * pairs:2]).sum(axis=1)
+
+
+@batched
+def batch_all_small(genomes):
+    """
+    Batched version of all_small()
+
+    :param genomes: 2-D array of float genomes
+    :returns:       the number of floats less than 0.1 in each genome
+    """
+    return (genomes < 0.1).sum(axis=1)
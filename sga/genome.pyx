@@ -15,18 +15,74 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #-------------------------------------------------------------------------------
 
+from classifier.gene import Gene
+
+#-------------------------------------------------------------------------------
+# The number of times any genome has copied its genes because it was about to
+# be written to while sharing them (see Genome.detach)
+#-------------------------------------------------------------------------------
+copies = 0
+
+
+def copy_genes(genes):
+    """
+    Return a copy of the given genes which shares no mutable state with them.
+    Gene objects are copied along with their alleles and mutation step sizes.
+    Immutable genes (e.g. binary strings) are returned as they are.
+
+    :param genes: the genes of a single genome
+    """
+    if not isinstance(genes, list) or not genes:
+        return genes
+
+    if not isinstance(genes[0], Gene):
+        return genes[:]
+
+    genes_copy = list()
+    for gene in genes:
+        gene_copy = Gene(gene.alleles[:])
+        gene_copy.class_label = gene.class_label
+        if gene.mutation_step_sizes is not None:
+            gene_copy.mutation_step_sizes = gene.mutation_step_sizes[:]
+        genes_copy.append(gene_copy)
+
+    return genes_copy
+
+
+def cow_safe(func):
+    """
+    Decorator which marks a crossover or mutation function as safe to call on
+    genomes which share their genes (see Genome.detach). The function must
+    never modify the genes it is given in place: it must either return new
+    genes, or only write through Genome.__setitem__, which copies first.
+    Genomes are copied before being passed to any unmarked function.
+    """
+    func.cow_safe = True
+    return func
+
+
+def is_cow_safe(func):
+    """
+    Return whether the given function was marked with @cow_safe
+    """
+    return getattr(func, 'cow_safe', False)
+
 
 cdef class Genome(object):
     """
     Class representing a single genome.
     """
-    cdef public list genes
+    cdef object _genes
     cdef public representation
     cdef public fitness_func
     cdef public natural_fitness
-    cdef public int _fitness
+    cdef public double _fitness
+    cdef public object _raw_fitness
+    cdef public list moves
     cdef public list average_sigmas
     cdef public dict strategy_params
+    cdef public bint dirty
+    cdef public bint shared
 
     def __init__(self, genes, representation, fitness_func, natural_fitness):
         """
@@ -43,17 +99,78 @@ cdef class Genome(object):
         self.fitness_func = fitness_func
         self.natural_fitness = natural_fitness
         self._fitness = -1
+        self._raw_fitness = None
+        self.shared = False
+
+    property genes:
+        """
+        This genome's actual genes. Assigning new genes marks the genome as
+        dirty, i.e. its fitness needs to be recalculated, and forgets any
+        moves recorded since the last evaluation.
+        """
+        def __get__(self):
+            return self._genes
+
+        def __set__(self, genes):
+            if genes is not self._genes:
+                self.moves = None
+            self._genes = genes
+            self.dirty = True
 
     def __repr__(self):
-        return repr(self.genes)
+        return repr(self._genes)
 
     def __len__(self):
-        return len(self.genes)
+        return len(self._genes)
 
     def __iter__(self):
-        return iter(self.genes)
+        return iter(self._genes)
+
+    def __getitem__(self, item):
+        return self._genes[item]
+
+    def __setitem__(self, key, value):
+        self.detach()
+
+        #-----------------------------------------------------------------------
+        # Record the position and previous value of each single gene written
+        # since the last evaluation, so that the fitness can be updated
+        # incrementally (see Population.fitness_delta)
+        #-----------------------------------------------------------------------
+        if self.moves is not None:
+            if isinstance(key, (int, long)):
+                key %= len(self._genes)
+                self.moves.append((key, self._genes[key]))
+            else:
+                self.moves = None
+
+        self._genes[key] = value
+        self.dirty = True
+
+    cpdef bint detach(self):
+        """
+        Make sure this genome has its own copy of its genes before they are
+        written to in place. Genomes copied with Population.make_copy share
+        their genes until one of them calls this.
+
+        :returns: whether the genes had to be copied
+        """
+        global copies
 
-    cpdef int fitness(self, recalculate=False) except *:
+        if not self.shared:
+            return False
+
+        genes = copy_genes(self._genes)
+        self.shared = False
+
+        if genes is self._genes:
+            return False
+
+        self._genes = genes
+        copies += 1
+        return True
+
+    cpdef double fitness(self, recalculate=False) except *:
         """
         Calculate the fitness of this genome.
 
@@ -62,28 +179,40 @@ cdef class Genome(object):
                   function, standardised
         """
         if recalculate:
+            self.set_fitness(self.fitness_func(self._genes))
 
-            raw_fitness = self.fitness_func(self.genes)
+        return self._fitness
 
-            if self.natural_fitness:
-                self._fitness = raw_fitness
-            else:
-                #---------------------------------------------------------------
-                # If standardised fitness is zero we have found the best
-                # possible solution. The evolutionary algorithm should not be
-                # continuing after finding it.
-                #---------------------------------------------------------------
-                self._fitness = float('inf') if raw_fitness == 0 \
-                    else 1.0 / raw_fitness
+    cpdef set_fitness(self, raw_fitness):
+        """
+        Store an already-calculated raw fitness value for this genome, e.g. one
+        which was calculated by a parallel evaluator.
 
-        return self._fitness
+        :param raw_fitness: the fitness value as returned by the user-specified
+                            fitness function
+        """
+        self._raw_fitness = raw_fitness
+        self.moves = list()
+
+        if self.natural_fitness:
+            self._fitness = raw_fitness
+        else:
+            #-------------------------------------------------------------------
+            # If standardised fitness is zero we have found the best possible
+            # solution. The evolutionary algorithm should not be continuing
+            # after finding it.
+            #-------------------------------------------------------------------
+            self._fitness = float('inf') if raw_fitness == 0 \
+                else 1.0 / raw_fitness
+
+        self.dirty = False
 
-    cpdef int raw_fitness(self):
+    cpdef raw_fitness(self):
         """
         Calculate the raw (natural) fitness of this genome.
 
         :returns: the fitness value as returned by the user-specified fitness
                   function
         """
-        return self.fitness_func(self.genes)
+        return self.fitness_func(self._genes)
 
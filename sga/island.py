@@ -0,0 +1,184 @@
+#-------------------------------------------------------------------------------
+# Author: Justin Lewis Salmon <mccrustin@gmail.com>
+#-------------------------------------------------------------------------------
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#-------------------------------------------------------------------------------
+
+import multiprocessing
+import numpy
+import random
+from Queue import Empty
+
+TOPOLOGIES = ('ring', 'random')
+
+
+def _run_island(factory, index, generations, inbox, outboxes, results,
+                migration_interval, migration_size, topology, seed,
+                termination):
+    """
+    Evolve a single island in a worker process, exchanging migrants with the
+    other islands, and put the fittest individual on the results queue
+    """
+    #---------------------------------------------------------------------------
+    # Every island starts with a copy of the parent's random state, so give
+    # each one its own
+    #---------------------------------------------------------------------------
+    random.seed(None if seed is None else seed + index)
+    numpy.random.seed(None if seed is None else seed + index)
+
+    p = factory(index)
+
+    if termination is not None:
+        termination.reset(p)
+
+    p.calculate_fitnesses()
+
+    for _ in xrange(1, generations):
+        if termination is not None and termination(p) is not None:
+            break
+
+        p.step()
+
+        if migration_interval and p.generation % migration_interval == 0:
+            #-------------------------------------------------------------------
+            # Send our best individuals on, then take in whichever migrants
+            # have arrived so far, without waiting for the slower islands
+            #-------------------------------------------------------------------
+            if len(outboxes) > 1:
+                if topology == 'ring':
+                    destination = (index + 1) % len(outboxes)
+                else:
+                    destination = random.choice([i for i in xrange(len(outboxes))
+                                                 if i != index])
+
+                outboxes[destination].put(p.emigrants(migration_size))
+
+            migrants = list()
+            while True:
+                try:
+                    migrants.extend(inbox.get_nowait())
+                except Empty:
+                    break
+
+            if migrants:
+                p.immigrate(migrants[:len(p) - p.elite_count])
+
+            print 'island=%d, generation=%d, mean fitness=%s, ' \
+                  'max individual=%s' \
+                  % (index, p.generation, p.mean_fitness(),
+                     p.max_individual().fitness())
+
+    best = p.max_individual()
+    results.put((index, best.genes, best.fitness(), p.evaluations))
+    p.evaluator.close()
+
+    #---------------------------------------------------------------------------
+    # Migrants which were never picked up don't need to be delivered
+    #---------------------------------------------------------------------------
+    for outbox in outboxes:
+        outbox.cancel_join_thread()
+
+
+class IslandModel(object):
+    """
+    Runs several populations ("islands") in parallel, one per process, which
+    periodically send copies of their fittest individuals to one another.
+    Each island may have its own selection, crossover and mutation settings.
+    """
+
+    def __init__(self, factory, islands, migration_interval=10,
+                 migration_size=2, topology='ring', seed=None,
+                 termination=None):
+        """
+        Constructor
+
+        :param            factory: function which takes the index of an island
+                                   and returns its initial population. It is
+                                   called in the island's own process.
+        :param            islands: the number of islands
+        :param migration_interval: the number of generations between
+                                   migrations, 0 to never migrate
+        :param     migration_size: the number of individuals each island sends
+                                   at each migration
+        :param           topology: where each island sends its migrants, either
+                                   "ring" (to the next island) or "random" (to
+                                   a random other island)
+        :param               seed: optional random seed. Island i is seeded
+                                   with seed + i.
+        :param        termination: optional termination criteria, which may
+                                   stop each island early (see
+                                   sga.termination)
+        """
+        if topology not in TOPOLOGIES:
+            raise ValueError('unknown migration topology: %s' % topology)
+
+        self.factory = factory
+        self.islands = islands
+        self.migration_interval = migration_interval
+        self.migration_size = migration_size
+        self.topology = topology
+        self.seed = seed
+        self.termination = termination
+
+    def run(self, generations):
+        """
+        Evolve every island for the given number of generations
+
+        :param generations: the number of generations/cycles to perform
+        :returns:           list of (island, genes, fitness, evaluations)
+                            tuples, one per island, holding the fittest
+                            individual of each island
+        """
+        inboxes = [multiprocessing.Queue() for _ in xrange(self.islands)]
+        results = multiprocessing.Queue()
+
+        workers = [multiprocessing.Process(target=_run_island,
+                                           args=(self.factory, i, generations,
+                                                 inboxes[i], inboxes, results,
+                                                 self.migration_interval,
+                                                 self.migration_size,
+                                                 self.topology, self.seed,
+                                                 self.termination))
+                   for i in xrange(self.islands)]
+
+        for worker in workers:
+            worker.start()
+
+        #-----------------------------------------------------------------------
+        # Collect the results before joining, so that no island is left
+        # waiting to flush them
+        #-----------------------------------------------------------------------
+        best = list()
+        while len(best) < self.islands:
+            try:
+                best.append(results.get(timeout=1))
+            except Empty:
+                if any(worker.exitcode for worker in workers):
+                    for worker in workers:
+                        worker.terminate()
+                    raise RuntimeError('an island exited unexpectedly')
+
+        for worker in workers:
+            worker.join()
+
+        best.sort()
+
+        for island, genes, fitness, evaluations in best:
+            print 'island=%d, max individual=%s, fitness evaluations=%d' \
+                  % (island, fitness, evaluations)
+
+        island, genes, fitness, _ = max(best, key=lambda result: result[2])
+        print 'best island=%d, max individual=%s %s' % (island, fitness, genes)
+
+        return best
@@ -0,0 +1,239 @@
+#-------------------------------------------------------------------------------
+# Author: Justin Lewis Salmon <mccrustin@gmail.com>
+#-------------------------------------------------------------------------------
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#-------------------------------------------------------------------------------
+
+import numpy
+import time
+from collections import deque
+
+
+class LocalSearch(object):
+    """
+    2-opt and Or-opt local search for tours, i.e. permutations of the cities
+    0..n-1 of a distance matrix. Used as the memetic step of a Population
+    (see Population.improve).
+
+    Only moves which add an edge from a city to one of its nearest neighbours
+    are tried, and cities whose neighbourhood didn't yield an improving move
+    are skipped ("don't-look bits") until one of their edges changes, so each
+    pass over a tour is close to linear in its length.
+    """
+
+    def __init__(self, distances, neighbours=8, or_opt=True):
+        """
+        Constructor
+
+        :param  distances: the full, symmetric distance matrix
+        :param neighbours: the number of nearest neighbours of each city to
+                           consider
+        :param     or_opt: also try moving segments of up to 3 cities to
+                           somewhere else in the tour
+        """
+        distances = numpy.asarray(distances)
+        n = len(distances)
+        neighbours = max(0, min(neighbours, n - 1))
+
+        #-----------------------------------------------------------------------
+        # Nearest neighbours of each city, closest first, never including the
+        # city itself (its distance is infinite here, so it always sorts last)
+        #-----------------------------------------------------------------------
+        nearest = distances.astype(numpy.float64)
+        numpy.fill_diagonal(nearest, numpy.inf)
+
+        if 0 < neighbours < n - 1:
+            candidates = numpy.argpartition(nearest, neighbours - 1,
+                                            axis=1)[:, :neighbours]
+        else:
+            candidates = numpy.argsort(nearest, axis=1,
+                                       kind='mergesort')[:, :neighbours]
+
+        order = numpy.argsort(nearest[numpy.arange(n)[:, numpy.newaxis],
+                                      candidates], axis=1, kind='mergesort')
+        candidates = candidates[numpy.arange(n)[:, numpy.newaxis], order]
+
+        #-----------------------------------------------------------------------
+        # Element-wise access to Python lists is much faster than to arrays
+        #-----------------------------------------------------------------------
+        self.distances = distances.tolist()
+        self.neighbours = candidates.tolist()
+        self.or_opt = or_opt
+
+    def __call__(self, tour, deadline=None):
+        """
+        Return a locally optimal copy of the given tour
+
+        :param     tour: the tour to improve
+        :param deadline: optional time.time() after which to stop improving
+                         the tour, returning the best found so far
+        """
+        tour = list(tour)
+        n = len(tour)
+
+        if n < 5:
+            return tour
+
+        self.tour = tour
+        self.positions = positions = [0] * n
+        for i, city in enumerate(tour):
+            positions[city] = i
+
+        queue = deque(tour)
+        queued = [True] * n
+
+        while queue:
+            if deadline is not None and time.time() > deadline:
+                break
+
+            city = queue.popleft()
+            queued[city] = False
+
+            changed = self.two_opt(city)
+            if changed is None and self.or_opt:
+                changed = self.segment_insertion(city)
+
+            #-------------------------------------------------------------------
+            # Look at the ends of each changed edge again
+            #-------------------------------------------------------------------
+            if changed is not None:
+                for end in changed:
+                    if not queued[end]:
+                        queue.append(end)
+                        queued[end] = True
+
+        del self.tour, self.positions
+        return tour
+
+    def succ(self, city):
+        return self.tour[(self.positions[city] + 1) % len(self.tour)]
+
+    def pred(self, city):
+        return self.tour[self.positions[city] - 1]
+
+    def two_opt(self, a):
+        """
+        Try to find and make an improving 2-opt move which adds an edge from
+        the given city to one of its neighbours
+
+        :returns: the cities whose edges changed, or None
+        """
+        d = self.distances
+
+        for step in (self.succ, self.pred):
+            b = step(a)
+            d_ab = d[a][b]
+
+            for c in self.neighbours[a]:
+                gain = d_ab - d[a][c]
+                if gain <= 0:
+                    break
+
+                e = step(c)
+                if c == a or c == b or e == a:
+                    continue
+
+                gain += d[c][e] - d[b][e]
+                if gain > 0:
+                    self.move(a, b, c, e)
+                    return a, b, c, e
+
+        return None
+
+    def segment_insertion(self, first):
+        """
+        Try to find and make an improving Or-opt move, which moves a segment
+        of 1-3 cities starting at the given city to between two other adjacent
+        cities, one of which is a neighbour of either end of the segment
+
+        :returns: the cities whose edges changed, or None
+        """
+        d = self.distances
+        tour = self.tour
+        n = len(tour)
+        start = self.positions[first]
+
+        for length in (1, 2, 3):
+            segment = [tour[(start + i) % n] for i in xrange(length)]
+            last = segment[-1]
+            p = self.pred(first)
+            q = self.succ(last)
+
+            if length >= n - 3:
+                break
+
+            removed = d[p][first] + d[last][q] - d[p][q]
+            members = set(segment)
+
+            for c in set(self.neighbours[first] + self.neighbours[last]):
+                for x, y in ((c, self.succ(c)), (self.pred(c), c)):
+                    #-----------------------------------------------------------
+                    # Inserting the segment next to where it already is is
+                    # covered by moving the neighbouring city instead
+                    #-----------------------------------------------------------
+                    if x in members or y in members or x == q or y == p:
+                        continue
+
+                    forward = d[x][first] + d[last][y]
+                    backward = d[x][last] + d[first][y]
+                    added = min(forward, backward) - d[x][y]
+
+                    if removed - added > 0:
+                        #-------------------------------------------------------
+                        # Make the move as a sequence of 2-opt moves, leaving
+                        # the segment reversed between x and y, then turn it
+                        # around if it's shorter the other way
+                        #-------------------------------------------------------
+                        self.move(p, first, x, y)
+                        self.move(p, x, q, last)
+                        if length > 1 and forward < backward:
+                            self.move(x, last, first, y)
+
+                        return p, q, x, y, first, last
+
+        return None
+
+    def move(self, a, b, c, d):
+        """
+        Replace the adjacent pairs (a, b) and (c, d), in the same direction
+        around the tour, with (a, c) and (b, d)
+        """
+        positions = self.positions
+
+        if self.succ(a) == b:
+            self.reverse(positions[b], positions[c])
+        else:
+            self.reverse(positions[a], positions[d])
+
+    def reverse(self, i, j):
+        """
+        Reverse the cyclic stretch of the tour from position i to position j
+        inclusive. Reversing the rest of the tour instead gives the same cycle,
+        so whichever is shorter is reversed.
+        """
+        tour = self.tour
+        positions = self.positions
+        n = len(tour)
+
+        length = (j - i) % n + 1
+        if 2 * length > n:
+            i, j = (j + 1) % n, (i - 1) % n
+            length = n - length
+
+        for _ in xrange(length // 2):
+            tour[i], tour[j] = tour[j], tour[i]
+            positions[tour[i]] = i
+            positions[tour[j]] = j
+            i = (i + 1) % n
+            j = (j - 1) % n
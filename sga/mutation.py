@@ -15,9 +15,15 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #-------------------------------------------------------------------------------
 
+import math
+import numpy
 import random
+from sga.batch import batched
+from sga.genome import cow_safe
+from sga.packed import PackedBinary
 
 
+@cow_safe
 def bit_flip(genome, probability):
     """
     Mutation function which flips each bit in the given genome with the given
@@ -28,6 +34,12 @@ def bit_flip(genome, probability):
     :param genome:  the genome representation to be mutated
     :returns:       the genome, possibly mutated
     """
+    genes = getattr(genome, 'genes', genome)
+
+    if isinstance(genes, PackedBinary):
+        return PackedBinary(genes.bits ^ _flip_mask(len(genes), probability),
+                            len(genes))
+
     genome = list(genome)
 
     for i, gene in enumerate(genome):
@@ -37,10 +49,35 @@ def bit_flip(genome, probability):
     return ''.join([gene for gene in genome])
 
 
+def _flip_mask(length, probability):
+    """
+    Return an integer mask in which each of the given number of bits is set
+    with the given probability. Rather than drawing a random number for every
+    bit, the gaps between set bits are drawn from a geometric distribution, so
+    the cost is proportional to the number of bits set.
+    """
+    if probability <= 0:
+        return 0
+    if probability >= 1:
+        return (1 << length) - 1
+
+    log_q = math.log(1.0 - probability)
+    mask = 0
+    i = int(math.log(1.0 - random.random()) / log_q)
+
+    while i < length:
+        mask |= 1 << i
+        i += int(math.log(1.0 - random.random()) / log_q) + 1
+
+    return mask
+
+
+@cow_safe
 def swap(genome, probability):
     """
     Mutation function which swaps the positions of two genes with the given
-    probability.
+    probability. The swap is written through the genome, which records the
+    two positions it touched (see Genome.moves).
 
     :param genome:  the genome representation to be mutated
     :returns:       the genome, possibly mutated
@@ -52,3 +89,44 @@ def swap(genome, probability):
         return genome
 
     return genome
+
+
+#-------------------------------------------------------------------------------
+# Vectorized mutation schemes. These take the genes of the whole population as
+# a 2-D array, one genome per row (see sga.batch.to_matrix), and return a new
+# array of mutated genes. The given array is not modified.
+#-------------------------------------------------------------------------------
+
+@batched
+def batch_bit_flip(genomes, probability):
+    """
+    Vectorized version of bit_flip(), using a single random mask for the whole
+    population.
+
+    Note: only works for binary representations
+
+    :param     genomes: the genes of each genome
+    :param probability: the probability that each bit will be flipped
+    :returns:           the genes of each genome, possibly mutated
+    """
+    mask = numpy.random.random(genomes.shape) < probability
+    return genomes ^ mask.astype(genomes.dtype)
+
+
+@batched
+def batch_swap(genomes, probability):
+    """
+    Vectorized version of swap(). A random pair of positions is swapped in
+    each genome that is chosen for mutation.
+
+    :param     genomes: the genes of each genome
+    :param probability: the probability that each genome will be mutated
+    :returns:           the genes of each genome, possibly mutated
+    """
+    genomes = genomes.copy()
+    rows = numpy.flatnonzero(numpy.random.random(len(genomes)) < probability)
+    r1 = numpy.random.randint(0, genomes.shape[1], len(rows))
+    r2 = numpy.random.randint(0, genomes.shape[1], len(rows))
+
+    genomes[rows, r1], genomes[rows, r2] = genomes[rows, r2], genomes[rows, r1]
+    return genomes
@@ -0,0 +1,109 @@
+#-------------------------------------------------------------------------------
+# Author: Justin Lewis Salmon <mccrustin@gmail.com>
+#-------------------------------------------------------------------------------
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#-------------------------------------------------------------------------------
+
+import random
+
+
+class PackedBinary(object):
+    """
+    Immutable binary genome stored as the bits of a single Python integer,
+    used by the "packed_binary" representation. The first gene is the most
+    significant bit, so str() gives the same '0'/'1' string as the "binary"
+    representation.
+
+    Being immutable, a PackedBinary can be shared between copies of a genome
+    and used directly as a fitness cache key.
+    """
+    __slots__ = ('bits', 'length')
+
+    def __init__(self, bits, length):
+        """
+        Constructor
+
+        :param   bits: the genes, as an integer
+        :param length: the number of genes
+        """
+        self.bits = bits
+        self.length = length
+
+    @classmethod
+    def random(cls, length):
+        """
+        Return a new genome of the given length with uniformly random bits
+        """
+        return cls(random.getrandbits(length) if length else 0, length)
+
+    @classmethod
+    def from_string(cls, genes):
+        """
+        Return a new genome from a string of '0's and '1's
+        """
+        return cls(int(genes, 2) if genes else 0, len(genes))
+
+    def __reduce__(self):
+        return PackedBinary, (self.bits, self.length)
+
+    def __str__(self):
+        return format(self.bits, '0%db' % self.length) if self.length else ''
+
+    def __repr__(self):
+        return 'PackedBinary(%r)' % str(self)
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        return iter(str(self))
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return str(self)[item]
+
+        if item < 0:
+            item += self.length
+        if not 0 <= item < self.length:
+            raise IndexError('genome index out of range')
+
+        return '1' if (self.bits >> (self.length - 1 - item)) & 1 else '0'
+
+    def __eq__(self, other):
+        return isinstance(other, PackedBinary) \
+            and self.bits == other.bits and self.length == other.length
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.bits, self.length))
+
+    def count(self):
+        """
+        Return the number of 1s in this genome
+        """
+        return bin(self.bits).count('1')
+
+    def head_mask(self, n):
+        """
+        Return an integer mask selecting the first n genes of this genome
+        """
+        return ((1 << n) - 1) << (self.length - n)
+
+    def full_mask(self):
+        """
+        Return an integer mask selecting every gene of this genome
+        """
+        return (1 << self.length) - 1
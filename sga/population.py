@@ -15,10 +15,17 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #-------------------------------------------------------------------------------
 
+import heapq
+import numpy
 import random
+import time
+from collections import OrderedDict
 from itertools import izip
-from classifier.gene import Gene
-from sga.genome import Genome
+from sga.batch import is_batched, to_matrix, from_matrix
+from sga.checkpoint import pack, unpack, encode_genes, decode_genes
+from sga.evaluator import SerialEvaluator
+from sga.genome import Genome, is_cow_safe
+from sga.packed import PackedBinary
 from sga.plotter import Plotter
 
 
@@ -30,7 +37,10 @@ class Population(object):
     def __init__(self, representation, size, fitness_func, selection_func,
                  crossover_func, mutation_func, natural_fitness,
                  crossover_probability, mutation_probability, elite_count,
-                 tournament_size):
+                 tournament_size, evaluator=None, fitness_cache=None,
+                 copy_on_write=True, fitness_delta=None, verify_delta=False,
+                 local_search=None, local_search_elites=False,
+                 local_search_time=None):
         """
         Constructor
 
@@ -48,6 +58,31 @@ class Population(object):
         :param           elite_count: the number of fittest individuals to
                                       exclude from selection/crossover/mutation
         :param       tournament_size: the size of a tournament selection group
+        :param             evaluator: the evaluator used to calculate the
+                                      fitness of each individual (default:
+                                      evaluate serially in this process)
+        :param         fitness_cache: an optional FitnessCache, consulted
+                                      before calling the fitness function
+        :param         copy_on_write: let copies of an individual share its
+                                      genes until one of them is written to
+                                      (see Genome.detach)
+        :param         fitness_delta: an optional function which updates a raw
+                                      fitness value after a few genes have
+                                      been changed, taking the new genes, the
+                                      old raw fitness and the list of
+                                      (position, old value) moves made since
+                                      (see Genome.moves)
+        :param          verify_delta: also calculate every incrementally
+                                      updated fitness in full, and raise an
+                                      error if they differ
+        :param          local_search: an optional function which returns an
+                                      improved copy of the given genes, applied
+                                      to the offspring at each generation (see
+                                      sga.localsearch)
+        :param   local_search_elites: only apply the local search to the
+                                      elites, rather than the offspring
+        :param     local_search_time: the maximum time in seconds to spend on
+                                      local search at each generation
         """
         self.population = list()
         self.elites = list()
@@ -85,17 +120,50 @@ class Population(object):
 
         self.tournament_size = tournament_size
 
+        self.evaluator = evaluator if evaluator is not None \
+            else SerialEvaluator()
+        self.fitness_cache = fitness_cache
+        self.copy_on_write = copy_on_write
+        self.fitness_delta = fitness_delta
+        self.verify_delta = verify_delta
+        self.local_search = local_search
+        self.local_search_elites = local_search_elites
+        self.local_search_time = local_search_time
+
         self.plotter = Plotter()
 
+        self.generation = 0
+        self.evaluations = 0
+        self.delta_evaluations = 0
+        self._fitness_index = None
+
         self.average_sigmas = list()
 
-    def run(self, generations):
+    def run(self, generations, termination=None, checkpoint=None):
         """
         Apply selection, crossover and mutation on the given population as many
         times as the given number of generations.
 
-        :param generations: the number of generations/cycles to perform
+        :param generations: the number of generations/cycles to perform, or
+                            None to carry on until the termination criteria
+                            are met
+        :param termination: optional termination criteria, checked after each
+                            generation, which may stop the run early (see
+                            sga.termination)
+        :param  checkpoint: optional Checkpoint to save the population to
+                            periodically, and to resume it from (see
+                            sga.checkpoint). A resumed run carries on up to
+                            the same total number of generations.
         """
+        resumed = checkpoint is not None and checkpoint.resume \
+            and checkpoint.exists()
+
+        if resumed:
+            checkpoint.load(self)
+
+        if termination is not None:
+            termination.reset(self)
+
         self.calculate_fitnesses()
 
         #-----------------------------------------------------------------------
@@ -104,7 +172,7 @@ class Population(object):
         print 'population size=%d, representation=%s, ' \
               'crossover probability=%f, mutation probability=%f, ' \
               'elite count=%d' \
-              % (len(self.population), self.representation,
+              % (len(self), self.representation,
                  self.crossover_probability, self.mutation_probability,
                  self.elite_count)
         print 'selection scheme=%s, crossover scheme=%s, mutation scheme=%s, ' \
@@ -113,17 +181,113 @@ class Population(object):
                  self.mutation_func,
                  self.fitness_func, self.natural_fitness)
 
-        print 'generation=0, total fitness=%d, mean fitness=%s, ' \
+        #-----------------------------------------------------------------------
+        # The generation a run resumes at was already reported before it was
+        # saved
+        #-----------------------------------------------------------------------
+        if resumed:
+            print 'resumed at generation=%d from %s' \
+                  % (self.generation, checkpoint.path)
+        else:
+            self.report()
+
+        #-----------------------------------------------------------------------
+        # Loop for each generation, until we run out of generations or meet
+        # the termination criteria
+        #-----------------------------------------------------------------------
+        reason = None if termination is None else termination(self)
+        saved = resumed
+
+        while reason is None \
+                and (generations is None or self.generation + 1 < generations):
+            self.step()
+            self.report()
+
+            saved = checkpoint is not None and checkpoint.due(self)
+            if saved:
+                checkpoint.save(self)
+
+            reason = None if termination is None else termination(self)
+
+        if reason is not None:
+            print 'stopped at generation=%d: %s' % (self.generation, reason)
+
+        if checkpoint is not None and not saved:
+            checkpoint.save(self)
+
+        self.report_evaluations()
+
+    def step(self):
+        """
+        Perform a single generation: selection, crossover, mutation and the
+        re-evaluation of the changed individuals. The fitness of the initial
+        population must already have been calculated.
+        """
+        #-----------------------------------------------------------------------
+        # Perform elitism
+        #-----------------------------------------------------------------------
+        self.store_elites()
+
+        #-----------------------------------------------------------------------
+        # Select the mating pool
+        #-----------------------------------------------------------------------
+        self.select_parents()
+
+        #-----------------------------------------------------------------------
+        # Apply crossover
+        #-----------------------------------------------------------------------
+        self.crossover(self.crossover_probability)
+
+        #-----------------------------------------------------------------------
+        # Apply mutation
+        #-----------------------------------------------------------------------
+        self.mutate(self.mutation_probability)
+
+        #-----------------------------------------------------------------------
+        # Re-add the elites to the population
+        #-----------------------------------------------------------------------
+        self.load_elites()
+
+        #-----------------------------------------------------------------------
+        # Apply local search
+        #-----------------------------------------------------------------------
+        if self.local_search is not None:
+            self.improve()
+
+        #-----------------------------------------------------------------------
+        # Recalculate fitnesses
+        #-----------------------------------------------------------------------
+        self.calculate_fitnesses()
+
+        self.generation += 1
+
+    def report(self):
+        """
+        Print the fitness statistics of the current generation, and add them to
+        the plot
+        """
+        min_individual = self.min_individual()
+        max_individual = self.max_individual()
+
+        # print 'generation=%d, total fitness=%d, mean fitness=%s, ' \
+        #       'min individual=%s (%s), max individual=%s (%s)' \
+        #       % (i, self.total_fitness(), self.mean_fitness(),
+        #          min_individual.genes,
+        #          min_individual.raw_fitness(),
+        #          max_individual.genes,
+        #          max_individual.raw_fitness())
+
+        print 'generation=%d, total fitness=%s, mean fitness=%s, ' \
               'min individual=%s (len=%d), max individual=%s (len=%d)' \
-              % (self.total_fitness(), self.mean_fitness(),
-                 self.min_individual().fitness(),
-                 len(self.min_individual()),
-                 self.max_individual().fitness(),
-                 len(self.max_individual()))
+              % (self.generation, self.total_fitness(), self.mean_fitness(),
+                 min_individual.fitness(),
+                 len(min_individual),
+                 max_individual.fitness(),
+                 len(max_individual))
 
         self.plotter.update(self.mean_fitness(),
-                            self.max_individual().fitness(),
-                            self.min_individual().fitness())
+                            max_individual.fitness(),
+                            min_individual.fitness())
 
         for i in self.population:
             if hasattr(i, 'average_sigmas') and i.average_sigmas is not None:
@@ -133,70 +297,155 @@ class Population(object):
         # print self.average_sigmas
         # print len(self.average_sigmas)
 
+    def report_evaluations(self):
+        """
+        Print the number of fitness evaluations made, and the fitness cache
+        statistics
+        """
+        print 'fitness evaluations=%d' % self.evaluations
+        if self.fitness_delta is not None:
+            print 'incremental fitness evaluations=%d' % self.delta_evaluations
+        if self.fitness_cache is not None:
+            print 'fitness cache: size=%d, hits=%d, misses=%d' \
+                  % (len(self.fitness_cache), self.fitness_cache.hits,
+                     self.fitness_cache.misses)
+
+    def emigrants(self, count):
+        """
+        Return the genes of the given number of fittest individuals, fittest
+        first, e.g. to send to another island (see sga.island)
+
+        :param count: the number of individuals to return
+        """
+        fitnesses = numpy.asarray(self.fitness_array())
+        fittest = numpy.argsort(-fitnesses, kind='mergesort')[:count]
+
+        return [self[i].genes for i in fittest]
+
+    def immigrate(self, migrants):
+        """
+        Replace the least fit individuals with new individuals with the given
+        genes, e.g. from another island (see sga.island), and evaluate them
+
+        :param migrants: the genes of each new individual
+        """
+        fitnesses = numpy.asarray(self.fitness_array())
+        weakest = numpy.argsort(fitnesses, kind='mergesort')[:len(migrants)]
+
+        for i, genes in izip(weakest, migrants):
+            self[i].genes = genes
+
+        self.calculate_fitnesses()
+
+    def get_state(self):
+        """
+        Return the state of the population as a dictionary of arrays, e.g. to
+        save to a checkpoint (see sga.checkpoint)
+        """
+        state = encode_genes([i.genes for i in self.population],
+                             self.representation)
+
+        state['fitnesses'] = numpy.array([i.fitness() for i in self.population],
+                                         dtype=numpy.float64)
+        state['raw_fitnesses'] = numpy.array(
+            [numpy.nan if i._raw_fitness is None else i._raw_fitness
+             for i in self.population], dtype=numpy.float64)
+        state['dirty'] = numpy.array([i.dirty for i in self.population],
+                                     dtype=bool)
+
         #-----------------------------------------------------------------------
-        # Loop for each generation
+        # Strategy parameters are stored as a column per name, with NaN where
+        # an individual has no such parameter
         #-----------------------------------------------------------------------
-        for i in xrange(1, generations):
-            #-------------------------------------------------------------------
-            # Perform elitism
-            #-------------------------------------------------------------------
-            self.store_elites()
+        params = [i.strategy_params for i in self.population]
+        names = sorted(set(name for p in params if p for name in p))
 
-            #-------------------------------------------------------------------
-            # Select the mating pool
-            #-------------------------------------------------------------------
-            self.select_parents()
+        state['strategy_names'] = numpy.array(names, dtype=str)
+        state['strategy_params'] = numpy.array(
+            [[p.get(name, numpy.nan) if p else numpy.nan for name in names]
+             for p in params], dtype=numpy.float64).reshape(len(params),
+                                                            len(names))
+        state['has_strategy_params'] = numpy.array(
+            [p is not None for p in params], dtype=bool)
 
-            #-------------------------------------------------------------------
-            # Apply crossover
-            #-------------------------------------------------------------------
-            self.crossover(self.crossover_probability)
+        state['sigma_lengths'], state['sigmas'] = pack(
+            [i.average_sigmas for i in self.population], numpy.float64)
 
-            #-------------------------------------------------------------------
-            # Apply mutation
-            #-------------------------------------------------------------------
-            self.mutate(self.mutation_probability)
+        state.update(self.get_counters())
+        return state
 
-            #-------------------------------------------------------------------
-            # Re-add the elites to the population
-            #-------------------------------------------------------------------
-            self.load_elites()
+    def get_counters(self):
+        """
+        Return the generation and evaluation counters, the plotter history and
+        the average sigmas as a dictionary of arrays (see get_state)
+        """
+        state = dict()
+        state['average_sigmas'] = numpy.array(self.average_sigmas,
+                                              dtype=numpy.float64)
+        state['plot'] = numpy.array([self.plotter.average_fitnesses,
+                                     self.plotter.highest_fitnesses,
+                                     self.plotter.lowest_fitnesses],
+                                    dtype=numpy.float64).reshape(3, -1)
+        state['counters'] = numpy.array([self.generation, self.evaluations,
+                                         self.delta_evaluations],
+                                        dtype=numpy.int64)
+        return state
+
+    def set_state(self, state, gene_class=None):
+        """
+        Replace the population with the one in the given state, as returned by
+        get_state()
 
-            #-------------------------------------------------------------------
-            # Recalculate fitnesses
-            #-------------------------------------------------------------------
-            self.calculate_fitnesses()
-
-            min_individual = self.min_individual()
-            max_individual = self.max_individual()
-
-            # print 'generation=%d, total fitness=%d, mean fitness=%s, ' \
-            #       'min individual=%s (%s), max individual=%s (%s)' \
-            #       % (i, self.total_fitness(), self.mean_fitness(),
-            #          min_individual.genes,
-            #          min_individual.raw_fitness(),
-            #          max_individual.genes,
-            #          max_individual.raw_fitness())
-
-            print 'generation=%d, total fitness=%d, mean fitness=%s, ' \
-                  'min individual=%s (len=%d), max individual=%s (len=%d)' \
-                  % (i, self.total_fitness(), self.mean_fitness(),
-                     self.min_individual().fitness(),
-                     len(self.min_individual()),
-                     self.max_individual().fitness(),
-                     len(self.max_individual()))
-
-            self.plotter.update(self.mean_fitness(),
-                                max_individual.fitness(),
-                                min_individual.fitness())
-
-            for i in self.population:
-                if hasattr(i, 'average_sigmas') and i.average_sigmas is not None:
-                    self.average_sigmas.append(sum(i.average_sigmas)
-                                               / len(i.average_sigmas))
-
-            # print self.average_sigmas
-            # print len(self.average_sigmas)
+        :param      state: the state to restore
+        :param gene_class: the class of each rule, if the genes are made of
+                           rules (see sga.checkpoint.decode_genes)
+        """
+        genes = decode_genes(state, self.representation, gene_class)
+        names = state['strategy_names'].tolist()
+        sigmas = unpack(state['sigma_lengths'], state['sigmas'])
+
+        population = list()
+
+        for i, g in enumerate(genes):
+            genome = Genome(g, representation=self.representation,
+                            fitness_func=self.fitness_func,
+                            natural_fitness=self.natural_fitness)
+
+            raw_fitness = state['raw_fitnesses'][i].item()
+
+            genome._fitness = state['fitnesses'][i].item()
+            genome._raw_fitness = None if numpy.isnan(raw_fitness) \
+                else raw_fitness
+            genome.dirty = state['dirty'][i].item()
+            genome.moves = list()
+
+            if state['has_strategy_params'][i]:
+                genome.strategy_params = dict(
+                    (name, value) for name, value
+                    in zip(names, state['strategy_params'][i].tolist())
+                    if not numpy.isnan(value))
+
+            if sigmas[i] is not None:
+                genome.average_sigmas = sigmas[i].tolist()
+
+            population.append(genome)
+
+        self.update_population(population)
+        self.set_counters(state)
+
+    def set_counters(self, state):
+        """
+        Restore the generation and evaluation counters, the plotter history and
+        the average sigmas from the given state (see get_counters)
+        """
+        self.generation, self.evaluations, self.delta_evaluations = \
+            state['counters'].tolist()
+        self.average_sigmas = state['average_sigmas'].tolist()
+
+        average, highest, lowest = state['plot'].tolist()
+        self.plotter.average_fitnesses = average
+        self.plotter.highest_fitnesses = highest
+        self.plotter.lowest_fitnesses = lowest
 
     def __iter__(self):
         return iter(self.population)
@@ -212,6 +461,7 @@ class Population(object):
         Generate an initial, random population based on the given representation
         dictionary.
         """
+        self.invalidate_index()
 
         #-----------------------------------------------------------------------
         # Generate binary population
@@ -226,6 +476,17 @@ class Population(object):
                               natural_fitness=self.natural_fitness)
                 self.population.append(gene)
 
+        #-----------------------------------------------------------------------
+        # Generate bit-packed binary population
+        #-----------------------------------------------------------------------
+        elif self.representation.type == 'packed_binary':
+            for _ in xrange(self.size):
+                gene = Genome(PackedBinary.random(self.representation.length),
+                              representation=self.representation,
+                              fitness_func=self.fitness_func,
+                              natural_fitness=self.natural_fitness)
+                self.population.append(gene)
+
         #-----------------------------------------------------------------------
         # Generate float value population
         #-----------------------------------------------------------------------
@@ -280,10 +541,128 @@ class Population(object):
                               natural_fitness=self.natural_fitness)
                 self.population.append(gene)
 
-    def calculate_fitnesses(self):
-        """"""
-        for i in self.population:
-            i.fitness(recalculate=True)
+    def calculate_fitnesses(self, individuals=None):
+        """
+        Recalculate the fitness of every dirty individual in the population,
+        using the configured evaluator. Individuals whose genes haven't changed
+        since they were last evaluated (e.g. elites, or children which weren't
+        changed by crossover or mutation) keep their existing fitness.
+        Individuals which only had a few of their genes changed are updated
+        incrementally, if a fitness delta function was given.
+
+        :param individuals: only recalculate the fitness of those of the given
+                            individuals which are dirty
+        """
+        dirty = self.dirty_individuals() if individuals is None \
+            else [i for i in individuals if i.dirty]
+        self.invalidate_index()
+
+        if self.fitness_delta is not None:
+            dirty = self.apply_deltas(dirty)
+
+        if self.fitness_cache is None:
+            self.evaluate(dirty)
+            return
+
+        #-----------------------------------------------------------------------
+        # Look up each dirty individual in the fitness cache. Individuals with
+        # identical genotypes in this generation are only evaluated once.
+        #-----------------------------------------------------------------------
+        pending = OrderedDict()
+
+        for individual in dirty:
+            key = self.fitness_cache.key(individual.genes)
+
+            if key in pending:
+                pending[key].append(individual)
+                self.fitness_cache.hits += 1
+                continue
+
+            raw_fitness = self.fitness_cache.get(key)
+
+            if raw_fitness is None:
+                pending[key] = [individual]
+            else:
+                individual.set_fitness(raw_fitness)
+
+        raw_fitnesses = self.evaluate([group[0] for group
+                                       in pending.itervalues()])
+
+        for (key, group), raw_fitness in izip(pending.iteritems(),
+                                              raw_fitnesses):
+            self.fitness_cache.put(key, raw_fitness)
+
+            for individual in group:
+                individual.set_fitness(raw_fitness)
+
+    def apply_deltas(self, individuals):
+        """
+        Update the fitness of each of the given individuals whose moves since
+        their last evaluation are known, using the fitness delta function.
+
+        :param individuals: the individuals whose fitness is out of date
+        :returns:           the individuals which still need to be evaluated
+        """
+        remaining = list()
+
+        for individual in individuals:
+            if individual.moves is None or individual._raw_fitness is None:
+                remaining.append(individual)
+                continue
+
+            raw_fitness = self.fitness_delta(individual.genes,
+                                             individual._raw_fitness,
+                                             individual.moves)
+
+            if self.verify_delta:
+                expected = self.fitness_func(individual.genes) \
+                    if not is_batched(self.fitness_func) else \
+                    self.fitness_func(to_matrix([individual.genes],
+                                                self.representation))[0]
+
+                if raw_fitness != expected:
+                    raise ValueError('incremental fitness %s does not match '
+                                     'full fitness %s for %s'
+                                     % (raw_fitness, expected, individual))
+
+            individual.set_fitness(raw_fitness)
+            self.delta_evaluations += 1
+
+        return remaining
+
+    def dirty_individuals(self):
+        """
+        Return the individuals whose fitness needs to be recalculated
+        """
+        return [i for i in self.population if i.dirty]
+
+    def evaluate(self, individuals):
+        """
+        Calculate the fitness of each of the given individuals using the
+        configured evaluator.
+
+        :param individuals: the individuals to evaluate
+        :returns:           the raw fitness value of each individual
+        """
+        #-----------------------------------------------------------------------
+        # Batched fitness functions take all of the genomes at once, as a
+        # single 2-D array
+        #-----------------------------------------------------------------------
+        if is_batched(self.fitness_func):
+            raw_fitnesses = list() if not len(individuals) else \
+                numpy.asarray(self.fitness_func(to_matrix(
+                    [i.genes for i in individuals],
+                    self.representation))).tolist()
+        else:
+            raw_fitnesses = self.evaluator.evaluate(self.fitness_func,
+                                                    individuals)
+
+        for individual, raw_fitness in izip(individuals, raw_fitnesses):
+            individual.set_fitness(raw_fitness)
+
+        self.evaluations += len(individuals)
+        self.invalidate_index()
+        return raw_fitnesses
 
     def update_population(self, population):
         """
@@ -292,12 +671,43 @@ class Population(object):
         :param population: the new population to use
         """
         self.population = population
+        self.invalidate_index()
+
+    def fitness_index(self):
+        """
+        Return a tuple of the fitness of every individual, the total fitness
+        and the positions of the least and most fit individuals, collected in
+        a single pass over the population. The result is kept until the
+        population or its fitness values next change.
+        """
+        if self._fitness_index is None:
+            fitnesses = [i.fitness() for i in self.population]
+            positions = xrange(len(fitnesses))
+
+            self._fitness_index = (fitnesses, sum(fitnesses),
+                                   min(positions, key=fitnesses.__getitem__),
+                                   max(positions, key=fitnesses.__getitem__))
+
+        return self._fitness_index
+
+    def invalidate_index(self):
+        """
+        Discard the fitness index, e.g. after the population has changed
+        """
+        self._fitness_index = None
+
+    def fitness_array(self):
+        """
+        Return the fitness of every individual in the population as a NumPy
+        array
+        """
+        return numpy.array(self.fitness_index()[0], dtype=numpy.float64)
 
     def total_fitness(self):
         """
         Return the total fitness of all of the individuals in the population
         """
-        return sum([i.fitness() for i in self.population])
+        return self.fitness_index()[1]
 
     def mean_fitness(self):
         """
@@ -310,26 +720,14 @@ class Population(object):
         Return the individual with the maximum (highest) fitness of all the
         individuals in the population
         """
-        max_indiv = self.population[0]
-
-        for i in self.population:
-            if i.fitness() > max_indiv.fitness():
-                max_indiv = i
-
-        return max_indiv
+        return self.population[self.fitness_index()[3]]
 
     def min_individual(self):
         """
         Return the individual with the  minimum (lowest) fitness of all the
         individuals in the population
         """
-        min_indiv = self.population[0]
-
-        for i in self.population:
-            if i.fitness() < min_indiv.fitness():
-                min_indiv = i
-
-        return min_indiv
+        return self.population[self.fitness_index()[2]]
 
     def store_elites(self):
         """
@@ -338,22 +736,70 @@ class Population(object):
         """
         del self.elites[:]
 
-        for i in xrange(self.elite_count):
-            max_indiv = self.max_individual()
-            self.elites.append(max_indiv)
-            self.population.remove(max_indiv)
+        if not self.elite_count:
+            return
+
+        #-----------------------------------------------------------------------
+        # nlargest() is stable, so ties go to the earliest individual, just as
+        # with max_individual()
+        #-----------------------------------------------------------------------
+        fitnesses = self.fitness_index()[0]
+        elites = heapq.nlargest(self.elite_count, xrange(len(fitnesses)),
+                                key=fitnesses.__getitem__)
+
+        self.elites.extend(self.population[i] for i in elites)
+
+        elites = set(elites)
+        self.update_population([individual for i, individual
+                                in enumerate(self.population)
+                                if i not in elites])
 
     def load_elites(self):
         """
         Re-add the withheld elites back into the population
         """
         self.population += self.elites
+        self.invalidate_index()
+
+    def improve(self, individuals=None):
+        """
+        Apply the local search function to the offspring which changed in this
+        generation, or to the elites, until they have all been improved or the
+        time limit for this generation has passed
+
+        :param individuals: improve the given individuals instead
+        """
+        if individuals is None:
+            individuals = self.elites if self.local_search_elites \
+                else self.dirty_individuals()
+
+        deadline = None if self.local_search_time is None \
+            else time.time() + self.local_search_time
+
+        for individual in individuals:
+            if deadline is not None and time.time() > deadline:
+                break
+
+            genes = self.local_search(individual.genes, deadline)
+
+            if genes != individual.genes:
+                individual.genes = genes
+
+        self.invalidate_index()
 
     def select_parents(self):
         """
         Perform population selection using the user-supplied selection function.
         """
-        selected_parents = self.selection_func(self)
+        if is_batched(self.selection_func):
+            indices = self.selection_func(
+                self.fitness_array(),
+                lengths=numpy.array([len(i) for i in self.population]),
+                tournament_size=self.tournament_size)
+            selected_parents = [self.population[i] for i in indices]
+        else:
+            selected_parents = self.selection_func(self)
+
         self.update_population([self.make_copy(i) for i in selected_parents])
 
     def crossover(self, probability):
@@ -363,26 +809,17 @@ class Population(object):
         :param probability: the probability that crossover will occur for each
                             pair of individuals
         """
+        if is_batched(self.crossover_func):
+            self.batch_crossover(probability)
+            return
+
         result = list()
 
         #-----------------------------------------------------------------------
         # Loop the population in twos
         #-----------------------------------------------------------------------
         for male, female in self.pairwise(self.population):
-            child1, child2 = self.make_copy(male), self.make_copy(female)
-
-            #-------------------------------------------------------------------
-            # Maybe do the crossover... maybe not
-            #-------------------------------------------------------------------
-            if random.random() <= probability:
-                child1.genes, child2.genes = self.crossover_func(child1.genes,
-                                                                 child2.genes)
-
-                # male.genes   = child1[:]
-                # female.genes = child2[:]
-
-            result.append(child1)
-            result.append(child2)
+            result.extend(self.cross_pair(male, female, probability))
 
                 # result.append(Genome(child1, self.representation,
                 #                      self.fitness_func, self.natural_fitness))
@@ -403,42 +840,172 @@ class Population(object):
         :param probability: the probability that mutation will occur for each
                             individual
         """
-        result = list()
+        if is_batched(self.mutation_func):
+            self.batch_mutate(probability)
+            return
+
+        result = [self.mutate_individual(i, probability)
+                  for i in self.population]
+
+        assert len(result) == len(self.population)
+        self.update_population(result)
+
+    def cross_pair(self, male, female, probability):
+        """
+        Return copies of the given parents, crossed over with the user-supplied
+        crossover function with the given probability
+
+        :param        male: the first parent
+        :param      female: the second parent
+        :param probability: the probability that crossover will occur
+        """
+        child1, child2 = self.make_copy(male), self.make_copy(female)
+
+        #-----------------------------------------------------------------------
+        # Maybe do the crossover... maybe not
+        #-----------------------------------------------------------------------
+        if random.random() <= probability:
+            if not is_cow_safe(self.crossover_func):
+                child1.detach()
+                child2.detach()
+
+            child1.genes, child2.genes = self.crossover_func(child1.genes,
+                                                             child2.genes)
 
-        for i in self.population:
             #-------------------------------------------------------------------
-            # Make a copy of the genes
+            # Functions which aren't copy-on-write safe may have changed the
+            # genes in place without recording the moves
             #-------------------------------------------------------------------
-            # i.genes = self.mutation_func(copy.deepcopy(i.genes), probability)
-            indiv_copy = self.make_copy(i)
-            genes = self.mutation_func(indiv_copy, probability)
+            if not is_cow_safe(self.crossover_func):
+                child1.moves = child2.moves = None
+
+            #-------------------------------------------------------------------
+            # Only re-evaluate the children if they actually changed
+            #-------------------------------------------------------------------
+            child1.dirty = male.dirty or child1.genes != male.genes
+            child2.dirty = female.dirty or child2.genes != female.genes
+
+            # male.genes   = child1[:]
+            # female.genes = child2[:]
+
+        return child1, child2
+
+    def mutate_individual(self, individual, probability):
+        """
+        Return a copy of the given individual, mutated with the user-supplied
+        mutation function
+
+        :param  individual: the individual to mutate
+        :param probability: the mutation probability passed to the mutation
+                            function
+        """
+        #-----------------------------------------------------------------------
+        # Make a copy of the genes
+        #-----------------------------------------------------------------------
+        # i.genes = self.mutation_func(copy.deepcopy(i.genes), probability)
+        indiv_copy = self.make_copy(individual)
+
+        if not is_cow_safe(self.mutation_func):
+            indiv_copy.detach()
+
+        genes = self.mutation_func(indiv_copy, probability)
+
+        #-----------------------------------------------------------------------
+        # The mutation function may have modified the genome in place and
+        # returned it, rather than returning new genes
+        #-----------------------------------------------------------------------
+        if genes is not indiv_copy:
             indiv_copy.genes = genes
-            result.append(indiv_copy)
 
-        assert len(result) == len(self.population)
+        if not is_cow_safe(self.mutation_func):
+            indiv_copy.moves = None
+
+        #-----------------------------------------------------------------------
+        # Only re-evaluate the copy if the mutation actually changed it
+        #-----------------------------------------------------------------------
+        indiv_copy.dirty = individual.dirty \
+            or indiv_copy.genes != individual.genes
+        return indiv_copy
+
+    def batch_crossover(self, probability):
+        """
+        Perform crossover on every chosen pair at once using a vectorized
+        crossover function (see crossover.batch_uniform)
+
+        :param probability: the probability that crossover will occur for each
+                            pair of individuals
+        """
+        result = [self.make_copy(i) for i in self.population]
+
+        pairs = len(result) // 2
+        males = 2 * numpy.flatnonzero(numpy.random.random(pairs) <= probability)
+        females = males + 1
+
+        if not len(males):
+            self.update_population(result)
+            return
+
+        children = self.crossover_func(
+            to_matrix([result[i].genes for i in males], self.representation),
+            to_matrix([result[i].genes for i in females], self.representation))
+
+        indices = numpy.concatenate((males, females))
+        genes = from_matrix(numpy.concatenate(children), self.representation)
+
+        for i, child_genes in izip(indices, genes):
+            parent = self.population[i]
+            result[i].genes = child_genes
+            result[i].dirty = parent.dirty or child_genes != parent.genes
+
+        self.update_population(result)
+
+    def batch_mutate(self, probability):
+        """
+        Perform mutation on the whole population at once using a vectorized
+        mutation function (see mutation.batch_bit_flip). Only the individuals
+        which actually changed are copied.
+
+        :param probability: the probability that mutation will occur
+        """
+        genes = to_matrix([i.genes for i in self.population],
+                          self.representation)
+        mutated = self.mutation_func(genes, probability)
+        changed = numpy.flatnonzero((mutated != genes).any(axis=1))
+
+        result = list(self.population)
+
+        for i, mutated_genes in izip(changed, from_matrix(mutated[changed],
+                                                          self.representation)):
+            result[i] = self.make_copy(self.population[i])
+            result[i].genes = mutated_genes
+            result[i].dirty = True
+
         self.update_population(result)
 
     def make_copy(self, individual):
-        if isinstance(individual.genes[0], Gene):
+        """
+        Return a copy of the given individual. With copy-on-write enabled, the
+        copy shares its genes with the original until either of them is
+        written to in place (see Genome.detach).
 
-            genes_copy = list()
-            for gene in individual.genes:
-                gene_copy = Gene(gene.alleles[:])
-                gene_copy.class_label = gene.class_label
-                if gene.mutation_step_sizes is not None:
-                    gene_copy.mutation_step_sizes = gene.mutation_step_sizes[:]
-                genes_copy.append(gene_copy)
+        :param individual: the individual to copy
+        """
+        genome = Genome(individual.genes, individual.representation,
+                        individual.fitness_func,
+                        individual.natural_fitness)
 
-            genome = Genome(genes_copy, individual.representation,
-                    individual.fitness_func,
-                    individual.natural_fitness)
+        genome.shared = True
 
+        if self.copy_on_write:
+            individual.shared = True
         else:
-            genome = Genome(individual.genes[:], individual.representation,
-                            individual.fitness_func,
-                            individual.natural_fitness)
+            genome.detach()
 
         genome._fitness = individual._fitness
+        genome._raw_fitness = individual._raw_fitness
+        genome.dirty = individual.dirty
+        if individual.moves is not None:
+            genome.moves = individual.moves[:]
         if hasattr(individual, 'strategy_params') \
                 and individual.strategy_params is not None:
             genome.strategy_params = individual.strategy_params.copy()
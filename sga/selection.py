@@ -17,7 +17,9 @@
 
 from bisect import bisect_left
 import copy
+import numpy
 import random
+from sga.batch import batched
 
 
 def roulette(population):
@@ -87,3 +89,115 @@ def tournament(population):
         selection.append(max_indiv)
 
     return selection
+
+
+#-------------------------------------------------------------------------------
+# Vectorized selection schemes. These take the fitness value of every
+# individual as a NumPy array and return an array of the indices of the
+# selected individuals. They all accept the same keyword parameters, even if
+# they don't use them, so that they can be called interchangeably:
+#
+#          lengths: the length of each individual, used to break ties
+#  tournament_size: the size of a tournament group
+#-------------------------------------------------------------------------------
+
+@batched
+def vectorized_roulette(fitnesses, lengths=None, tournament_size=None):
+    """
+    Vectorized version of roulette(), using a single cumulative sum and binary
+    search.
+
+    :param fitnesses: the fitness value of each individual
+    :returns:         the indices of the newly selected population
+    """
+    cumulative_fitnesses = numpy.cumsum(fitnesses)
+    random_fitnesses = numpy.random.random(len(fitnesses)) \
+        * cumulative_fitnesses[-1]
+
+    return numpy.searchsorted(cumulative_fitnesses, random_fitnesses,
+                              side='left')
+
+
+@batched
+def vectorized_tournament(fitnesses, lengths=None, tournament_size=None):
+    """
+    Vectorized version of tournament(). All of the tournaments are drawn at
+    once as a (population size x tournament size) matrix of indices. The
+    fittest contestant wins each tournament, and ties go to the shortest.
+
+    :param       fitnesses: the fitness value of each individual
+    :param         lengths: the length of each individual
+    :param tournament_size: the size of a tournament group (default: 10)
+    :returns:               the indices of the newly selected population
+    """
+    tournament_size = tournament_size if tournament_size else 10
+    contestants = numpy.random.randint(0, len(fitnesses),
+                                       (len(fitnesses), tournament_size))
+    scores = fitnesses[contestants]
+    fittest = scores == scores.max(axis=1)[:, numpy.newaxis]
+
+    #---------------------------------------------------------------------------
+    # The winner is the first of the shortest of the fittest contestants
+    #---------------------------------------------------------------------------
+    if lengths is None:
+        winners = fittest.argmax(axis=1)
+    else:
+        winners = numpy.where(fittest, lengths[contestants], numpy.inf) \
+            .argmin(axis=1)
+
+    return contestants[numpy.arange(len(fitnesses)), winners]
+
+
+@batched
+def stochastic_universal(fitnesses, lengths=None, tournament_size=None):
+    """
+    Stochastic universal sampling. Like roulette wheel selection, but the whole
+    population is selected with a single spin of a wheel with evenly spaced
+    pointers, which gives much lower variance.
+
+    :param fitnesses: the fitness value of each individual
+    :returns:         the indices of the newly selected population
+    """
+    cumulative_fitnesses = numpy.cumsum(fitnesses)
+    step = cumulative_fitnesses[-1] / float(len(fitnesses))
+    pointers = (numpy.random.random() + numpy.arange(len(fitnesses))) * step
+
+    selection = numpy.searchsorted(cumulative_fitnesses, pointers, side='left')
+
+    #---------------------------------------------------------------------------
+    # The pointers select individuals in order, so shuffle them to avoid
+    # always pairing up neighbours for crossover
+    #---------------------------------------------------------------------------
+    return numpy.random.permutation(selection)
+
+
+@batched
+def rank(fitnesses, lengths=None, tournament_size=None, pressure=1.5):
+    """
+    Linear ranking selection. Individuals are selected with a probability
+    proportional to their rank, rather than their raw fitness, so a few very
+    fit individuals can't take over the population.
+
+    :param fitnesses: the fitness value of each individual
+    :param  pressure: the expected number of times the fittest individual is
+                      selected, between 1.0 and 2.0 (default: 1.5)
+    :returns:         the indices of the newly selected population
+    """
+    size = len(fitnesses)
+
+    if size < 2:
+        return numpy.zeros(size, dtype=numpy.intp)
+
+    #---------------------------------------------------------------------------
+    # Rank 0 is the least fit individual
+    #---------------------------------------------------------------------------
+    ranks = numpy.empty(size)
+    ranks[numpy.argsort(fitnesses, kind='mergesort')] = numpy.arange(size)
+
+    weights = (2 - pressure) / size \
+        + 2 * ranks * (pressure - 1) / (size * (size - 1))
+    cumulative_weights = numpy.cumsum(weights)
+
+    return numpy.searchsorted(cumulative_weights,
+                              numpy.random.random(size)
+                              * cumulative_weights[-1], side='left')
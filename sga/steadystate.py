@@ -0,0 +1,202 @@
+#-------------------------------------------------------------------------------
+# Author: Justin Lewis Salmon <mccrustin@gmail.com>
+#-------------------------------------------------------------------------------
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#-------------------------------------------------------------------------------
+
+import heapq
+import random
+from sga.batch import is_batched
+from sga.population import Population
+
+REPLACEMENTS = ('worst', 'tournament')
+
+
+class SteadyStatePopulation(Population):
+    """
+    Population which is evolved a few offspring at a time rather than a whole
+    generation at once. Each batch of offspring is bred from parents chosen by
+    tournament, evaluated straight away, and put in place of the least fit
+    individuals (or the losers of a tournament) if they are at least as fit.
+
+    The least fit individual is found with a heap of (fitness, version, index)
+    entries. Replacing an individual bumps the version of its index, rather
+    than searching the heap for its old entry, and out of date entries are
+    skipped when they reach the top.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """
+        Constructor. Takes the same parameters as Population, plus:
+
+        :param   offspring: the number of offspring to breed and evaluate at a
+                            time (default: 2)
+        :param replacement: which individuals the offspring replace, either
+                            "worst" (the least fit individuals) or
+                            "tournament" (the least fit of a random tournament
+                            group) (default: worst)
+        """
+        self.offspring = kwargs.pop('offspring', 2)
+        self.replacement = kwargs.pop('replacement', 'worst')
+
+        super(SteadyStatePopulation, self).__init__(*args, **kwargs)
+
+        if self.replacement not in REPLACEMENTS:
+            raise ValueError('unknown replacement scheme: %s'
+                             % self.replacement)
+
+        if is_batched(self.crossover_func) or is_batched(self.mutation_func):
+            raise ValueError('steady-state populations breed a few offspring '
+                             'at a time, so cannot use batched crossover or '
+                             'mutation functions')
+
+        self.heap = list()
+        self.versions = list()
+
+    def step(self):
+        """
+        Breed as many offspring as there are individuals in the population,
+        a few at a time (see breed)
+        """
+        for _ in xrange(max(1, len(self) // self.offspring)):
+            self.breed()
+
+        self.generation += 1
+
+    def breed(self):
+        """
+        Breed, evaluate and insert a single batch of offspring
+        """
+        children = self.make_offspring()
+
+        if self.local_search is not None:
+            self.improve(children)
+
+        self.calculate_fitnesses(children)
+
+        for child in children:
+            self.insert(child)
+
+    def make_offspring(self):
+        """
+        Return a batch of new, unevaluated offspring, bred from parents chosen
+        by tournament
+        """
+        children = list()
+
+        while len(children) < self.offspring:
+            male = self.population[self.tournament()]
+            female = self.population[self.tournament()]
+
+            for child in self.cross_pair(male, female,
+                                         self.crossover_probability):
+                children.append(self.mutate_individual(
+                    child, self.mutation_probability))
+
+        del children[self.offspring:]
+        return children
+
+    def insert(self, child):
+        """
+        Put the given evaluated child in place of the least fit individual (or
+        the loser of a tournament), if it is at least as fit
+
+        :param child: the child to insert
+        """
+        #-----------------------------------------------------------------------
+        # The heap is dropped whenever individuals change other than by
+        # replace(), e.g. by migration
+        #-----------------------------------------------------------------------
+        if len(self.versions) != len(self):
+            self.rebuild_heap()
+
+        index = self.heap_min() if self.replacement == 'worst' \
+            else self.tournament(fittest=False)
+
+        if child.fitness() >= self.population[index].fitness():
+            self.replace(index, child)
+
+    def tournament(self, fittest=True):
+        """
+        Return the index of the fittest (or least fit) of a random group of
+        tournament_size individuals
+        """
+        group = random.sample(xrange(len(self)),
+                              min(len(self), self.tournament_size or 2))
+        key = lambda i: self.population[i].fitness()
+
+        return max(group, key=key) if fittest else min(group, key=key)
+
+    def rebuild_heap(self):
+        """
+        Rebuild the heap from the current population, dropping any out of
+        date entries
+        """
+        if len(self.versions) != len(self):
+            self.versions = [0] * len(self)
+
+        self.heap = [(individual.fitness(), self.versions[i], i)
+                     for i, individual in enumerate(self.population)]
+        heapq.heapify(self.heap)
+
+    def heap_min(self):
+        """
+        Return the index of the least fit individual, in O(log N) amortised
+        time
+        """
+        while True:
+            fitness, version, index = self.heap[0]
+
+            if version == self.versions[index]:
+                return index
+
+            heapq.heappop(self.heap)
+
+    def replace(self, index, individual):
+        """
+        Put the given (evaluated) individual in place of the one at the given
+        index
+
+        :param      index: the position of the individual to replace
+        :param individual: the new individual
+        """
+        self.population[index] = individual
+        self.versions[index] += 1
+        heapq.heappush(self.heap, (individual.fitness(), self.versions[index],
+                                   index))
+
+        #-----------------------------------------------------------------------
+        # Don't let the out of date entries pile up
+        #-----------------------------------------------------------------------
+        if len(self.heap) > 2 * len(self):
+            self.rebuild_heap()
+
+        self.invalidate_index()
+
+    def update_population(self, population):
+        super(SteadyStatePopulation, self).update_population(population)
+        self.versions = list()
+
+    def immigrate(self, migrants):
+        super(SteadyStatePopulation, self).immigrate(migrants)
+        self.versions = list()
+
+    def store_elites(self):
+        """
+        Nothing to do, as only the least fit individuals are ever replaced
+        """
+        pass
+
+    def load_elites(self):
+        pass
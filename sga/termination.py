@@ -0,0 +1,235 @@
+#-------------------------------------------------------------------------------
+# Author: Justin Lewis Salmon <mccrustin@gmail.com>
+#-------------------------------------------------------------------------------
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#-------------------------------------------------------------------------------
+
+import time
+from sga.cache import FitnessCache
+
+#-------------------------------------------------------------------------------
+# Termination criteria, which decide when Population.run should stop before it
+# reaches its number of generations. A criterion is called with the population
+# after each generation, and returns the reason for stopping, or None to carry
+# on. Criteria can be combined with | (stop when any of them is met) and &
+# (stop when all of them are met).
+#-------------------------------------------------------------------------------
+
+
+class Criterion(object):
+    """
+    Base class for termination criteria
+    """
+
+    def reset(self, population):
+        """
+        Called once at the start of a run, before the initial population is
+        evaluated
+
+        :param population: the population being run
+        """
+        pass
+
+    def __call__(self, population):
+        """
+        Return the reason the given population should stop evolving, or None
+        if it should carry on
+
+        :param population: the population being run
+        """
+        raise NotImplementedError
+
+    def __or__(self, other):
+        return Any(self, other)
+
+    def __and__(self, other):
+        return All(self, other)
+
+
+class Any(Criterion):
+    """
+    Stop when any of the given criteria is met
+    """
+
+    def __init__(self, *criteria):
+        self.criteria = criteria
+
+    def reset(self, population):
+        for criterion in self.criteria:
+            criterion.reset(population)
+
+    def __call__(self, population):
+        #-----------------------------------------------------------------------
+        # Every criterion sees every generation, as some of them keep state
+        #-----------------------------------------------------------------------
+        reasons = [criterion(population) for criterion in self.criteria]
+        reasons = [reason for reason in reasons if reason is not None]
+
+        return ', '.join(reasons) if reasons else None
+
+
+class All(Any):
+    """
+    Stop when all of the given criteria are met at once
+    """
+
+    def __call__(self, population):
+        reasons = [criterion(population) for criterion in self.criteria]
+
+        return None if None in reasons else ' and '.join(reasons)
+
+
+class TargetFitness(Criterion):
+    """
+    Stop when the fittest individual reaches the given raw fitness value, i.e.
+    has at least that value with natural fitness, or at most that value
+    without
+    """
+
+    def __init__(self, target):
+        """
+        Constructor
+
+        :param target: the raw fitness value to reach
+        """
+        self.target = target
+
+    def __call__(self, population):
+        #-----------------------------------------------------------------------
+        # Compare standardised fitness values (see Genome.set_fitness), so that
+        # fitter is always higher
+        #-----------------------------------------------------------------------
+        if population.natural_fitness:
+            target = self.target
+        else:
+            target = float('inf') if self.target == 0 else 1.0 / self.target
+
+        if population.max_individual().fitness() >= target:
+            return 'reached target fitness %s' % self.target
+
+        return None
+
+
+class Stagnation(Criterion):
+    """
+    Stop when the fitness of the fittest individual hasn't improved for the
+    given number of generations
+    """
+
+    def __init__(self, generations, tolerance=0.0):
+        """
+        Constructor
+
+        :param generations: the number of generations without improvement to
+                            allow
+        :param   tolerance: the amount the (standardised) fitness has to
+                            increase by to count as an improvement
+        """
+        self.generations = generations
+        self.tolerance = tolerance
+        self.best = None
+        self.since = 0
+
+    def reset(self, population):
+        self.best = None
+        self.since = 0
+
+    def __call__(self, population):
+        best = population.max_individual().fitness()
+
+        if self.best is None or best > self.best + self.tolerance:
+            self.best = best
+            self.since = 0
+            return None
+
+        self.since += 1
+
+        if self.since >= self.generations:
+            return 'no improvement for %d generations' % self.since
+
+        return None
+
+
+class DiversityFloor(Criterion):
+    """
+    Stop when the proportion of distinct genotypes in the population falls
+    below the given value
+    """
+
+    def __init__(self, minimum):
+        """
+        Constructor
+
+        :param minimum: the lowest proportion of distinct genotypes to allow,
+                        between 0 and 1
+        """
+        self.minimum = minimum
+
+    def __call__(self, population):
+        diversity = len(set(FitnessCache.key(individual.genes)
+                            for individual in population)) \
+            / float(len(population))
+
+        if diversity < self.minimum:
+            return 'diversity %s fell below %s' % (diversity, self.minimum)
+
+        return None
+
+
+class TimeLimit(Criterion):
+    """
+    Stop once the given number of seconds have passed since the start of the
+    run
+    """
+
+    def __init__(self, seconds):
+        """
+        Constructor
+
+        :param seconds: the wall-clock time limit of the run
+        """
+        self.seconds = seconds
+        self.start = None
+
+    def reset(self, population):
+        self.start = time.time()
+
+    def __call__(self, population):
+        if self.start is None:
+            self.start = time.time()
+
+        if time.time() - self.start >= self.seconds:
+            return 'time limit of %ss reached' % self.seconds
+
+        return None
+
+
+class MaxEvaluations(Criterion):
+    """
+    Stop once the population has made the given number of fitness evaluations
+    """
+
+    def __init__(self, evaluations):
+        """
+        Constructor
+
+        :param evaluations: the maximum number of fitness evaluations
+        """
+        self.evaluations = evaluations
+
+    def __call__(self, population):
+        if population.evaluations >= self.evaluations:
+            return '%d fitness evaluations made' % population.evaluations
+
+        return None
@@ -0,0 +1,74 @@
+#-------------------------------------------------------------------------------
+# Author: Justin Lewis Salmon <mccrustin@gmail.com>
+#-------------------------------------------------------------------------------
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#-------------------------------------------------------------------------------
+
+import numpy
+import random
+import unittest
+from sga.localsearch import LocalSearch
+
+
+def random_distances(n, rng):
+    """
+    Return a random symmetric integer distance matrix with a zero diagonal
+    """
+    points = rng.randint(0, 1000, (n, 2))
+    deltas = points[:, numpy.newaxis] - points
+    return numpy.rint(numpy.sqrt((deltas ** 2).sum(axis=2))).astype(numpy.int64)
+
+
+def tour_length(tour, distances):
+    return sum(distances[tour[i - 1]][tour[i]] for i in xrange(len(tour)))
+
+
+class LocalSearchTest(unittest.TestCase):
+
+    def check(self, n, neighbours, tours, seed):
+        rng = numpy.random.RandomState(seed)
+        distances = random_distances(n, rng)
+        search = LocalSearch(distances, neighbours=neighbours)
+
+        for city in xrange(n):
+            self.assertNotIn(city, search.neighbours[city])
+
+        for _ in xrange(tours):
+            tour = list(rng.permutation(n))
+            improved = search(tour)
+
+            self.assertEqual(sorted(improved), range(n))
+            self.assertLessEqual(tour_length(improved, distances),
+                                 tour_length(tour, distances))
+
+    def test_small_instances(self):
+        """
+        With at least as many neighbours as other cities, every other city is
+        a neighbour, and the search still terminates
+        """
+        for n in xrange(5, 10):
+            for neighbours in (n - 2, n - 1, 8, 100):
+                self.check(n, neighbours, tours=20, seed=n * 1000 + neighbours)
+
+    def test_larger_instances(self):
+        rng = random.Random(0)
+
+        for neighbours in (1, 3, 8):
+            for _ in xrange(20):
+                self.check(rng.randint(12, 60), neighbours, tours=5,
+                           seed=rng.randint(0, 2 ** 31))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,32 +1,207 @@
-from sga.crossover import noop
+import math
+import numpy
+import os
+from sga.batch import batched
+from sga.crossover import edge_recombination
+from sga.localsearch import LocalSearch
 from sga.mutation import swap
 from sga.population import Population
 from sga.representation import Representation
 from sga.selection import tournament
 
 #-------------------------------------------------------------------------------
-# Map for the TSP problem with 15 cities
+# TSPLIB files for the TSP problems with 15, 30, 29, 24 and 42 cities. They
+# are only read the first time they are asked for (see load_map)
 #-------------------------------------------------------------------------------
-tsp_lau15_map = list()
-with open("tsplib/lau15_dist.txt") as f:
-    tsp_lau15_map = [[int(num) for num in line.split()] for line in f]
+TSP_MAP_FILES = {'lau15': 'tsplib/lau15_dist.txt',
+                 'ha30': 'tsplib/ha30_dist.txt',
+                 'bays29': 'tsplib/bays29.tsp',
+                 'gr24': 'tsplib/gr24.tsp',
+                 'swiss42': 'tsplib/swiss42.tsp'}
 
-#-------------------------------------------------------------------------------
-# Map for the TSP problem with 30 cities
-#-------------------------------------------------------------------------------
-tsp_ha30_map = list()
-with open("tsplib/ha30_dist.txt") as f:
-    tsp_ha30_map = [[int(num) for num in line.split()] for line in f]
+_tsp_maps = dict()
 
-#-------------------------------------------------------------------------------
-# Map for the TSP problem with 29 cities
-#-------------------------------------------------------------------------------
-tsp_bays29_map = list()
-tsp_bays29_names = list()
-with open("tsplib/bays29.tsp") as f:
 
-    tsp_bays29_map = [[int(num) for num in line.split()]
-                      for line in f if not line.startswith('#')]
+def load_map(name):
+    """
+    Return the distance matrix of the named TSP problem as a NumPy array,
+    reading it from disk the first time it is asked for
+
+    :param name: one of the keys of TSP_MAP_FILES
+    """
+    if name not in _tsp_maps:
+        _tsp_maps[name] = read_matrix(TSP_MAP_FILES[name])
+
+    return _tsp_maps[name]
+
+
+def read_matrix(tsp_file, cache=True):
+    """
+    Return the full distance matrix of the given TSPLIB file as a NumPy array
+    (see parse_tsplib). The matrix is saved to a .npy file next to the
+    source file, and later calls memory-map that file instead of parsing the
+    source again, for as long as it is newer than the source.
+
+    :param tsp_file: the TSPLIB file to read
+    :param    cache: whether to use the .npy cache
+    """
+    cache_file = tsp_file + '.npy'
+
+    if cache and os.path.exists(cache_file) \
+            and os.path.getmtime(cache_file) >= os.path.getmtime(tsp_file):
+        return numpy.load(cache_file, mmap_mode='r')
+
+    distances = parse_tsplib(tsp_file)[1]
+
+    #---------------------------------------------------------------------------
+    # Write the cache to a temporary file first, so that a half-written cache
+    # is never loaded. Not being able to write it isn't an error.
+    #---------------------------------------------------------------------------
+    if cache:
+        temp_file = '%s.%d.tmp' % (cache_file, os.getpid())
+        try:
+            with open(temp_file, 'wb') as f:
+                numpy.save(f, distances)
+            os.rename(temp_file, cache_file)
+        except (IOError, OSError):
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+
+    return distances
+
+
+def parse_tsplib(tsp_file):
+    """
+    Parse a symmetric TSPLIB file. Explicit FULL_MATRIX, LOWER_DIAG_ROW,
+    UPPER_ROW, UPPER_DIAG_ROW and LOWER_ROW matrices are supported, as are
+    EUC_2D, CEIL_2D, GEO and ATT coordinates. Header lines may be commented
+    out with '#', and a file with no header at all is read as a full matrix.
+
+    :param tsp_file: the TSPLIB file to parse
+    :returns:        tuple of the header dictionary and the full distance
+                     matrix, as a contiguous int64 array
+    """
+    header = dict()
+    sections = dict()
+    section = 'EDGE_WEIGHT_SECTION'
+
+    with open(tsp_file) as f:
+        for line in f:
+            line = line.strip().lstrip('#').strip()
+            if not line:
+                continue
+
+            keyword = line.split(':', 1)[0].strip().upper()
+
+            if keyword == 'EOF':
+                break
+            elif keyword.endswith('_SECTION'):
+                section = keyword
+            elif ':' in line and keyword.replace('_', '').isalpha():
+                header[keyword] = line.split(':', 1)[1].strip()
+            else:
+                sections.setdefault(section, list()).append(line)
+
+    weight_type = header.get('EDGE_WEIGHT_TYPE', 'EXPLICIT').upper()
+
+    if weight_type == 'EXPLICIT':
+        values = numpy.array(' '.join(sections['EDGE_WEIGHT_SECTION']).split(),
+                             dtype=numpy.float64)
+        weight_format = header.get('EDGE_WEIGHT_FORMAT', 'FULL_MATRIX').upper()
+
+        if 'DIMENSION' in header:
+            dimension = int(header['DIMENSION'])
+        else:
+            dimension = int(round(math.sqrt(len(values))))
+
+        distances = explicit_matrix(values, dimension, weight_format)
+
+    else:
+        #-----------------------------------------------------------------------
+        # Each line of the coordinate section is "<node> <x> <y>"
+        #-----------------------------------------------------------------------
+        coords = numpy.array(' '.join(sections['NODE_COORD_SECTION']).split(),
+                             dtype=numpy.float64).reshape(-1, 3)[:, 1:]
+        distances = coordinate_matrix(coords, weight_type)
+
+    return header, numpy.ascontiguousarray(distances, dtype=numpy.int64)
+
+
+def explicit_matrix(values, dimension, weight_format):
+    """
+    Return the full, symmetric distance matrix described by the given values
+    of an EDGE_WEIGHT_SECTION in the given format
+    """
+    if weight_format == 'FULL_MATRIX':
+        return values.reshape(dimension, dimension)
+
+    #---------------------------------------------------------------------------
+    # The triangular formats list the matrix row by row, which is the order
+    # that tril_indices/triu_indices return the positions in
+    #---------------------------------------------------------------------------
+    if weight_format == 'LOWER_DIAG_ROW':
+        rows, columns = numpy.tril_indices(dimension)
+    elif weight_format == 'LOWER_ROW':
+        rows, columns = numpy.tril_indices(dimension, -1)
+    elif weight_format == 'UPPER_DIAG_ROW':
+        rows, columns = numpy.triu_indices(dimension)
+    elif weight_format == 'UPPER_ROW':
+        rows, columns = numpy.triu_indices(dimension, 1)
+    else:
+        raise ValueError('unsupported EDGE_WEIGHT_FORMAT: %s' % weight_format)
+
+    distances = numpy.zeros((dimension, dimension))
+    distances[rows, columns] = values[:len(rows)]
+    distances[columns, rows] = values[:len(rows)]
+    return distances
+
+
+def coordinate_matrix(coords, weight_type):
+    """
+    Return the full distance matrix between each pair of the given (x, y)
+    coordinates, using the TSPLIB distance function of the given type
+    """
+    x = coords[:, 0]
+    y = coords[:, 1]
+
+    if weight_type in ('EUC_2D', 'CEIL_2D'):
+        distances = numpy.hypot(x[:, numpy.newaxis] - x,
+                                y[:, numpy.newaxis] - y)
+        return numpy.ceil(distances) if weight_type == 'CEIL_2D' \
+            else numpy.floor(distances + 0.5)
+
+    if weight_type == 'ATT':
+        #-----------------------------------------------------------------------
+        # Pseudo-Euclidean distance, rounded up
+        #-----------------------------------------------------------------------
+        r = numpy.sqrt(((x[:, numpy.newaxis] - x) ** 2
+                        + (y[:, numpy.newaxis] - y) ** 2) / 10.0)
+        t = numpy.floor(r + 0.5)
+        return numpy.where(t < r, t + 1, t)
+
+    if weight_type == 'GEO':
+        #-----------------------------------------------------------------------
+        # Coordinates are DDD.MM degrees and minutes of latitude/longitude.
+        # The degrees are truncated, as in the reference implementation.
+        #-----------------------------------------------------------------------
+        pi = 3.141592
+        rrr = 6378.388
+
+        degrees = numpy.trunc(coords)
+        radians = pi * (degrees + 5.0 * (coords - degrees) / 3.0) / 180.0
+        latitude = radians[:, 0]
+        longitude = radians[:, 1]
+
+        q1 = numpy.cos(longitude[:, numpy.newaxis] - longitude)
+        q2 = numpy.cos(latitude[:, numpy.newaxis] - latitude)
+        q3 = numpy.cos(latitude[:, numpy.newaxis] + latitude)
+
+        distances = numpy.floor(rrr * numpy.arccos(numpy.clip(
+            0.5 * ((1.0 + q1) * q2 - (1.0 - q1) * q3), -1.0, 1.0)) + 1.0)
+        numpy.fill_diagonal(distances, 0)
+        return distances
+
+    raise ValueError('unsupported EDGE_WEIGHT_TYPE: %s' % weight_type)
 
 
 class TSP(object):
@@ -35,11 +210,14 @@ class TSP(object):
     http://www.iwr.uni-heidelberg.de/groups/comopt/software/TSPLIB95/
     """
     def __init__(self, tsp_file):
+        """
+        Constructor
 
-        with open(tsp_file) as f:
-            self.tsp_map = [[int(num) for num in line.split()]
-                            for line in f if not line.startswith('#')]
-            self.city_names = [i for i in xrange(len(self.tsp_map))]
+        :param tsp_file: the TSPLIB file describing the problem (see
+                         parse_tsplib)
+        """
+        self.distances = read_matrix(tsp_file)
+        self.city_names = range(len(self.distances))
 
     def calc_tour(self, genome):
         """
@@ -49,13 +227,58 @@ class TSP(object):
             print genome
             raise ValueError('Tour invalid. Fix the crossover/mutation func')
 
-        v = list()
+        tour = numpy.asarray(genome)
+        return int(self.distances[tour, numpy.roll(tour, -1)].sum())
+
+    def calc_tour_delta(self, genome, length, moves):
+        """
+        Update the length of a tour after some of its cities have been moved,
+        e.g. by mutation.swap. Only the edges either side of each moved
+        position are recalculated, so a swap costs O(1) rather than O(n).
+
+        :param genome: the tour after the moves
+        :param length: the length of the tour before the moves
+        :param  moves: list of (position, previous city) pairs, in the order
+                       they were made (see Genome.moves)
+        :returns:      the length of the tour after the moves
+        """
+        #-----------------------------------------------------------------------
+        # The first recorded city at each position is the one which was there
+        # when the length was last calculated
+        #-----------------------------------------------------------------------
+        previous = dict()
+        for position, city in moves:
+            previous.setdefault(position, city)
+
+        n = len(genome)
+        edges = set()
+        for position in previous:
+            edges.add((position - 1) % n)
+            edges.add(position)
+
+        distances = self.distances
+
+        for i in edges:
+            j = (i + 1) % n
+            length += distances[genome[i], genome[j]] \
+                - distances[previous.get(i, genome[i]), previous.get(j,
+                                                                 genome[j])]
+
+        return int(length)
 
-        for i, gene in enumerate(genome):
-            j = i + 1 if i != (len(genome) - 1) else 0
-            v.append(self.tsp_map[genome[i]][genome[j]])
+    @batched
+    def calc_tour_batch(self, tours):
+        """
+        Batched version of calc_tour(), which calculates the length of every
+        tour at once with a single gather from the distance matrix.
+
+        :param tours: 2-D array with one tour (permutation of cities) per row
+        """
+        ordered = numpy.sort(tours, axis=1)
+        if (ordered[:, 1:] == ordered[:, :-1]).any():
+            raise ValueError('Tour invalid. Fix the crossover/mutation func')
 
-        return sum(v)
+        return self.distances[tours, numpy.roll(tours, -1, axis=1)].sum(axis=1)
 
 
 def main():
@@ -90,15 +313,18 @@ def main():
 
     p = Population(representation=Representation(representation),
                    size=100,
-                   fitness_func=tsp.calc_tour,
+                   fitness_func=tsp.calc_tour_batch,
+                   fitness_delta=tsp.calc_tour_delta,
                    selection_func=tournament,
-                   crossover_func=noop,
+                   crossover_func=edge_recombination,
                    mutation_func=swap,
                    natural_fitness=False,
                    crossover_probability=0.5,
                    mutation_probability=0.3,
                    elite_count=6,
-                   tournament_size=10)
+                   tournament_size=10,
+                   local_search=LocalSearch(tsp.distances),
+                   local_search_time=0.1)
     p.gen_population()
 
     #---------------------------------------------------------------------------